@@ -0,0 +1,84 @@
+"""
+Startup time benchmark of read-only odoons commands
+
+Generates a project with many addons entries in a temporary directory and measures
+the wall time of `odoons addons` run in a fresh interpreter. Once the parsed config
+cache is warm, the YAML stack must not be imported at all.
+
+Usage:
+  python benchmarks/startup.py [--addons N] [--runs N] [--max-ms MS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_project(directory, addons_count):
+    lines = [
+        "odoons:",
+        "  odoo:",
+        "    version: '14.0'",
+        "    path: vendor/odoo",
+        "  addons:",
+    ]
+    for index in range(addons_count):
+        lines += [
+            "    addons-{}:".format(index),
+            "      type: git",
+            "      path: vendor/addons-{}".format(index),
+            "      url: https://example.com/addons-{}.git".format(index),
+            "      branch: '14.0'",
+        ]
+    path = os.path.join(directory, "odoons.yml")
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    return path
+
+
+def run_addons(directory, extra_args=None):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    command = [sys.executable] + (extra_args or []) + ["-m", "odoons.core", "addons"]
+    start = time.perf_counter()
+    process = subprocess.run(
+        command, cwd=directory, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    return time.perf_counter() - start, process.stderr.decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--addons", type=int, default=200, help="Number of addons entries")
+    parser.add_argument("--runs", type=int, default=10, help="Number of measured runs")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail when the median exceeds this value")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_project(directory, args.addons)
+        cold, _ = run_addons(directory)
+        timings = [run_addons(directory)[0] for _ in range(args.runs)]
+        _, importtime = run_addons(directory, ["-X", "importtime"])
+
+    median = statistics.median(timings) * 1000
+    print("addons entries: {}".format(args.addons))
+    print("cold run:       {:.1f} ms".format(cold * 1000))
+    print("warm median:    {:.1f} ms".format(median))
+    print("warm min:       {:.1f} ms".format(min(timings) * 1000))
+
+    errors = []
+    if "ruamel" in importtime:
+        errors.append("ruamel.yaml is imported although the parsed config cache is warm")
+    if args.max_ms is not None and median > args.max_ms:
+        errors.append("median startup time {:.1f} ms exceeds {:.1f} ms".format(median, args.max_ms))
+    for error in errors:
+        print("FAIL: " + error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
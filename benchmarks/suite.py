@@ -0,0 +1,364 @@
+"""
+Benchmark suite of odoons commands on local git fixtures
+
+Local bare repositories with many commits and modules are generated (no network
+needed), then projects with 1, 10, 50 and 200 addons entries are timed through
+`Odoons().run(args)` for the following scenarios:
+
+- init: fresh clone of every repository, configuration file and wrapper
+- update-noop: `pull` when no remote branch moved
+- update-changes: `pull` after a new commit was pushed on every remote branch
+- config: configuration file generation
+- addons: addons path listing
+- reset: deletion of every repository (`reset --wait` so runs do not overlap)
+
+A pinned commit bump with a mirror directory is checked first: the pinned commit
+must be checked out although it was pushed after the mirror was created.
+
+Results are stored as JSON and can be compared against a baseline result file.
+
+Usage:
+  python benchmarks/suite.py [--sizes 1,10,50,200] [--runs N] [--output FILE]
+                             [--baseline FILE] [--max-regression RATIO]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from odoons.core import Odoons  # noqa: E402
+
+BRANCH = "14.0"
+SCENARIOS = ("init", "update-noop", "update-changes", "config", "addons", "reset")
+ODOO_MODULES = ("web", "mail", "sale", "stock", "account")
+
+
+def _data(content):
+    return "data {}\n{}\n".format(len(content.encode()), content)
+
+
+def _manifest(name, depends):
+    return "{{'name': '{}', 'version': '{}.1.0.0', 'depends': {!r}}}\n".format(name, BRANCH, list(depends))
+
+
+def _commit_stream(files, counter, message, append):
+    """
+    :param files: dict() path -> content of the files written by the commit
+    :param counter: commit counter used as commit time
+    :param message: commit message
+    :param append: whether the commit is appended to the existing branch
+    :return: git fast-import commit command
+    """
+    stream = "commit refs/heads/{}\n".format(BRANCH)
+    stream += "committer Benchmark <benchmark@example.com> {} +0000\n".format(1600000000 + counter)
+    stream += _data(message)
+    if append:
+        stream += "from refs/heads/{}^0\n".format(BRANCH)
+    for path, content in sorted(files.items()):
+        stream += "M 100644 inline {}\n".format(path) + _data(content)
+    return stream
+
+
+def _fast_import(repository, stream):
+    subprocess.run(
+        ["git", "--git-dir", repository, "fast-import", "--quiet"],
+        input=stream.encode(),
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def create_remote(repository, modules, commits):
+    """
+    Create a bare repository with the given modules and number of commits
+
+    :param repository: bare repository path
+    :param modules: dict() module directory -> (module name, depends)
+    :param commits: number of commits
+    :return: None
+    """
+    subprocess.run(["git", "init", "--quiet", "--bare", repository], check=True)
+    subprocess.run(["git", "--git-dir", repository, "symbolic-ref", "HEAD", "refs/heads/" + BRANCH], check=True)
+    files = {}
+    for directory, (name, depends) in modules.items():
+        files[directory + "/__init__.py"] = ""
+        files[directory + "/__manifest__.py"] = _manifest(name, depends)
+    stream = _commit_stream(files, 0, "Initial commit", False)
+    directories = sorted(modules)
+    for counter in range(1, commits):
+        directory = directories[counter % len(directories)]
+        content = "# revision {}\n".format(counter)
+        stream += _commit_stream({directory + "/models.py": content}, counter, "Commit {}".format(counter), False)
+    _fast_import(repository, stream)
+
+
+def push_change(repository):
+    """
+    Append a commit on the branch of the given bare repository
+
+    :param repository: bare repository path
+    :return: None
+    """
+    counter = int(time.time() * 1000) % 100000000
+    files = {"CHANGES": "change {}\n".format(counter)}
+    _fast_import(repository, _commit_stream(files, counter, "Change {}".format(counter), True))
+
+
+def create_fixtures(directory, addons_count, modules_count, commits):
+    """
+    :return: tuple (Odoo bare repository, list of addons bare repositories)
+    """
+    odoo = os.path.join(directory, "odoo.git")
+    modules = {"odoo/addons/base": ("base", [])}
+    for name in ODOO_MODULES:
+        modules["addons/" + name] = (name, ["base"])
+    create_remote(odoo, modules, commits)
+
+    addons = []
+    for index in range(addons_count):
+        repository = os.path.join(directory, "addons-{}.git".format(index))
+        modules = {}
+        for module_index in range(modules_count):
+            name = "addons_{}_{}".format(index, module_index)
+            modules[name] = (name, ["web"] if module_index == 0 else ["addons_{}_0".format(index)])
+        create_remote(repository, modules, commits)
+        addons.append(repository)
+    return odoo, addons
+
+
+def get_branch_head(repository):
+    command = ["git", "--git-dir", repository, "rev-parse", "refs/heads/" + BRANCH]
+    return subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout.decode().strip()
+
+
+def write_project(directory, odoo, addons, mirror_dir=None, pins=None):
+    """
+    :param mirror_dir: optional mirror directory option
+    :param pins: optional dict() addons bare repository -> pinned commit
+    :return: None
+    """
+    pins = pins or {}
+    lines = [
+        "odoons:",
+        "  odoo:",
+        "    version: '{}'".format(BRANCH),
+        "    url: file://{}".format(odoo),
+        "    path: vendor/odoo",
+        "    options:",
+        "      data_dir: data",
+        "  options:",
+        "    apply-requirements: false",
+        "    install-odoo-command: false",
+    ]
+    if mirror_dir:
+        lines += ["    mirror-directory: {}".format(mirror_dir)]
+    lines += ["  addons:"]
+    for index, repository in enumerate(addons):
+        lines += [
+            "    addons-{}:".format(index),
+            "      type: git",
+            "      path: vendor/addons-{}".format(index),
+            "      url: file://{}".format(repository),
+            "      branch: '{}'".format(BRANCH),
+        ]
+        if repository in pins:
+            lines += ["      commit: {}".format(pins[repository])]
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "odoons.yml"), "w") as file:
+        file.write("\n".join(lines) + "\n")
+    with open(os.path.join(directory, "odoo.cfg.template"), "w") as file:
+        file.write("[options]\n")
+
+
+@contextlib.contextmanager
+def silenced():
+    """
+    Silence odoons and git output at file descriptor level
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [devnull]:
+            os.close(fd)
+
+
+def timed(directory, args, verbose):
+    """
+    Run odoons in-process from the given project directory
+
+    :return: wall time in seconds
+    """
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        start = time.perf_counter()
+        if verbose:
+            Odoons().run(args)
+        else:
+            with silenced():
+                Odoons().run(args)
+        return time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+
+def run_size(directory, odoo, addons, runs, jobs, verbose):
+    """
+    Time every scenario on a project using the given repositories
+
+    :return: dict() scenario -> list of wall times
+    """
+    write_project(directory, odoo, addons)
+    jobs_args = ["-j", str(jobs)] if jobs else []
+    timings = {scenario: [] for scenario in SCENARIOS}
+    for _ in range(runs):
+        timings["init"].append(timed(directory, ["init"] + jobs_args, verbose))
+        timings["update-noop"].append(timed(directory, ["pull"] + jobs_args, verbose))
+        for repository in [odoo] + addons:
+            push_change(repository)
+        timings["update-changes"].append(timed(directory, ["pull"] + jobs_args, verbose))
+        timings["config"].append(timed(directory, ["config"], verbose))
+        timings["addons"].append(timed(directory, ["addons"], verbose))
+        timings["reset"].append(timed(directory, ["reset", "--wait"] + jobs_args, verbose))
+    return timings
+
+
+def check_mirror_pin_bump(directory, odoo, repository, verbose):
+    """
+    Bump a pinned commit to a commit pushed after the mirror was created
+
+    :return: error message or None
+    """
+    mirror_dir = os.path.join(directory, "mirrors")
+    write_project(directory, odoo, [repository], mirror_dir, {repository: get_branch_head(repository)})
+    timed(directory, ["init"], verbose)
+    push_change(repository)
+    commit = get_branch_head(repository)
+    write_project(directory, odoo, [repository], mirror_dir, {repository: commit})
+    timed(directory, ["pull"], verbose)
+    head = subprocess.run(
+        ["git", "-C", os.path.join(directory, "vendor", "addons-0"), "rev-parse", "HEAD"], stdout=subprocess.PIPE
+    )
+    if head.stdout.decode().strip() != commit:
+        return "pinned commit {} not checked out with a mirror directory".format(commit)
+    return None
+
+
+def summarize(timings):
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "runs": timings,
+    }
+
+
+def get_metadata(args):
+    git_version = subprocess.run(["git", "--version"], stdout=subprocess.PIPE, check=True).stdout.decode().strip()
+    revision = subprocess.run(
+        ["git", "-C", ROOT_DIR, "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": revision.stdout.decode().strip() or None,
+        "python": platform.python_version(),
+        "git": git_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": args.runs,
+        "jobs": args.jobs,
+        "modules": args.modules,
+        "commits": args.commits,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print the median ratio of every scenario against the baseline
+
+    :return: list of regressions exceeding max_regression
+    """
+    regressions = []
+    print("{:>8} {:<16} {:>12} {:>12} {:>8}".format("addons", "scenario", "baseline", "current", "ratio"))
+    for size, scenarios in results.items():
+        for scenario, summary in scenarios.items():
+            reference = baseline.get(size, {}).get(scenario)
+            if not reference:
+                continue
+            ratio = summary["median"] / reference["median"] if reference["median"] else float("inf")
+            print(
+                "{:>8} {:<16} {:>10.1f}ms {:>10.1f}ms {:>7.2f}x".format(
+                    size, scenario, reference["median"] * 1000, summary["median"] * 1000, ratio
+                )
+            )
+            if max_regression is not None and ratio > max_regression:
+                regressions.append("{} addons {}: {:.2f}x slower".format(size, scenario, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,50,200", help="Comma separated numbers of addons entries")
+    parser.add_argument("--runs", type=int, default=3, help="Number of measured runs per size")
+    parser.add_argument("--jobs", type=int, default=None, help="odoons -j value. Default: odoons default")
+    parser.add_argument("--modules", type=int, default=10, help="Number of modules per addons repository")
+    parser.add_argument("--commits", type=int, default=50, help="Number of commits per repository")
+    parser.add_argument("--output", default="benchmark-results.json", help="Result file")
+    parser.add_argument("--baseline", default=None, help="Baseline result file to compare with")
+    parser.add_argument("--max-regression", type=float, default=None, help="Fail when a median ratio exceeds it")
+    parser.add_argument("--verbose", action="store_true", help="Show odoons output")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="odoons-bench-") as directory:
+        print("Creating fixtures ({} addons repositories)...".format(sizes[-1]))
+        odoo, addons = create_fixtures(os.path.join(directory, "remotes"), sizes[-1], args.modules, args.commits)
+        print("Checking pinned commit bump with a mirror directory...")
+        error = check_mirror_pin_bump(os.path.join(directory, "project-mirror"), odoo, addons[0], args.verbose)
+        if error:
+            print("FAIL: " + error)
+            return 1
+        for size in sizes:
+            print("Benchmarking {} addons...".format(size))
+            project_dir = os.path.join(directory, "project-{}".format(size))
+            timings = run_size(project_dir, odoo, addons[:size], args.runs, args.jobs, args.verbose)
+            results[str(size)] = {scenario: summarize(values) for scenario, values in timings.items()}
+            for scenario in SCENARIOS:
+                print("  {:<16} {:>10.1f} ms".format(scenario, results[str(size)][scenario]["median"] * 1000))
+
+    with open(args.output, "w") as file:
+        json.dump({"metadata": get_metadata(args), "results": results}, file, indent=2)
+    print("Results written to {}".format(args.output))
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline["results"], args.max_regression)
+    for regression in regressions:
+        print("FAIL: " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
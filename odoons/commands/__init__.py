@@ -1,10 +1,37 @@
-from . import init
-from . import pull
-from . import install
-from . import config
-from . import migrate
-from . import wrapper
-from . import reset
-from . import addons
+"""
+Commands are registered lazily: a command module is only imported when the command
+is actually run so scripting commands (e.g. `odoons addons`) start fast.
+"""
+import importlib
+from collections import OrderedDict
 
 from .command import commands_registry
+
+COMMANDS = OrderedDict(
+    [
+        ("init", "Initialize Odoo, addons and configuration file"),
+        ("pull", "Clone or update Odoo and addons source code"),
+        ("install", "Install or update python dependencies"),
+        ("config", "Generate Odoo configuration file with proper addons_path"),
+        ("migrate", "Migrate buildout file(s) to Odoons"),
+        ("wrapper", "Generate the start_odoo wrapper"),
+        ("reset", "Delete additional addons"),
+        ("addons", "List additional addons"),
+        ("modules", "List Odoo modules, duplicates and dependency trees"),
+        ("snapshot", "Export or import a snapshot of Odoo and addons checkouts"),
+        ("workspace", "Share repositories checkouts between several projects"),
+        ("watch", "Keep addons and Odoo configuration file up to date while editing"),
+    ]
+)
+
+
+def get_command(name):
+    """
+    Import the given command module if needed and return its command class
+
+    :param name: command name
+    :return: Command subclass
+    """
+    if name not in commands_registry:
+        importlib.import_module("." + name, __name__)
+    return commands_registry[name]
@@ -2,26 +2,78 @@ import os
 
 from .command import Command
 
+from odoons.utils import printing
+from odoons.utils.config import OPT_TARGET_MODULES, OPT_FLATTEN_ADDONS, OPT_FLATTEN_DIR
+from odoons.utils.modules import ModuleIndex
+from odoons.utils.state import get_state_dir
+
+FLATTEN_DIRECTORY = "addons"
+
 
 class Addons(Command):
-    def _addons_path(self, args):
+    def _get_flatten_directory(self):
+        directory = self._options.get(OPT_FLATTEN_DIR)
+        if directory:
+            return os.path.abspath(directory)
+        return os.path.join(get_state_dir(self._options), FLATTEN_DIRECTORY)
+
+    def _get_closure(self, index, targets):
+        """
+        Compute the dependency closure of target modules
+
+        Missing dependencies are reported and raise an error so they are caught before deploying.
+
+        :param index: refreshed ModuleIndex
+        :param targets: target module names
+        :return: set of module names
+        """
+        closure, missing = index.dependency_closure(targets)
+        if missing:
+            for name, required_by in missing:
+                printing.error(
+                    "Missing module {}{}".format(name, " required by {}".format(required_by) if required_by else "")
+                )
+            raise RuntimeError("Missing modules in addons paths")
+        return closure
+
+    def _addons_paths(self, write=True):
+        """
+        Compute the addons paths
+
+        With `target-modules`, only the addons paths providing their dependency closure
+        are kept. With `flatten-addons`, modules are linked into a single directory used
+        next to the Odoo framework addons path.
+
+        :param write: maintain the flattened addons directory links and persist the module index
+        :return: list of addons paths
+        """
+        targets = [str(target) for target in self._options.get(OPT_TARGET_MODULES) or []]
+        flatten = self._options.get(OPT_FLATTEN_ADDONS, False)
+        if not targets and not flatten:
+            return list(self._project.addons_paths)
+        if flatten and not write:
+            return [self._project.addons_paths[0], self._get_flatten_directory()]
+
+        index = ModuleIndex(self._project)
+        index.refresh(write=write)
+        closure = self._get_closure(index, targets) if targets else None
+        if flatten:
+            directory = self._get_flatten_directory()
+            updated, removed = index.flatten(directory, closure)
+            if updated or removed:
+                printing.debug("Flattened addons: {} links updated, {} removed".format(updated, removed))
+            return [self._project.addons_paths[0], directory]
+        return index.pruned_addons_paths(closure)
+
+    def _addons_path(self, args, write=True):
         """
         Action method responsible of the ACTION_LS sub command
 
         :return: None
         """
-        if not self._odoo or not self._addons:
+        if not self._project:
             self.load_config(args.file)
-
-        odoo_path = os.path.abspath(self._odoo["path"])
-        paths = [
-            os.path.join(odoo_path, "odoo/addons"),
-            os.path.join(odoo_path, "addons"),
-        ]
-        for name, conf in self._addons.items():
-            abspath = os.path.abspath(conf["path"])
-            paths.append(abspath)
-        return ",".join(paths)
+        return ",".join(self._addons_paths(write))
 
     def run(self, args):
         print(self._addons_path(args))
@@ -1,12 +1,39 @@
 """
 This file defines the base Command class handling the base
 """
-from odoons.utils.config import load_odoons_config, DEFAULT_OPTIONS
+import os
+from types import MappingProxyType
+
+from odoons.utils.config import DEFAULT_OPTIONS
+from odoons.utils.project import load_project
 
 
 commands_registry = {}
 
 
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of repositories processed concurrently. Default: CPU count",
+    )
+
+
+def add_offline_argument(parser):
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never access the network: use local checkouts and mirrors only and fail fast otherwise",
+    )
+
+
+def get_jobs(args):
+    jobs = getattr(args, "jobs", None) or os.cpu_count() or 1
+    return max(jobs, 1)
+
+
 class CommandType(type):
     def __init__(cls, name, bases, attrs):
         super(CommandType, cls).__init__(name, bases, attrs)
@@ -21,16 +48,26 @@ BaseCommand = CommandType('Command', (object,), {
     "configure_parser": lambda self, parser: None,
     "_args": None,
     "_parser": None,
-    "_options": dict(DEFAULT_OPTIONS),
+    "_options": MappingProxyType(DEFAULT_OPTIONS),
+    "_project": None,
     "_odoo": None,
     "_addons": None,
 })
 
 
 class Command(BaseCommand):
-    def load_config(self, path):
-        parsed_config = load_odoons_config(path)
-        self._odoo = parsed_config["odoo"]
-        self._addons = parsed_config.get("addons", [])
-        self._options.update(parsed_config.get("options", {}))
+    def load_config(self, path, write=True):
+        """
+        Load the shared project model of the given odoons YAML file
+
+        The model is parsed once per process and is read-only: commands must not mutate it.
+
+        :param path: odoons YAML file path
+        :param write: whether the on disk configuration cache may be written
+        :return: None
+        """
+        self._project = load_project(path, write)
+        self._odoo = self._project.odoo
+        self._addons = self._project.addons
+        self._options = self._project.options
 
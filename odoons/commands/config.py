@@ -1,18 +1,19 @@
+import io
 import os
-import shutil
 from configparser import ConfigParser
 
-from .command import Command, commands_registry
+from .command import Command
+from . import get_command
 
 from odoons.utils import printing
 from odoons.utils.config import OPT_CONF_DIR, OPT_CONF_TEMPLATE, DEFAULT_OPTIONS
 
 
 class Config(Command):
-    def _get_config_path(self, options=None):
-        options = self._options or options
+    def _get_config_path(self, options=None, create=True):
+        options = options or self._options
         conf_dir = options.get(OPT_CONF_DIR, DEFAULT_OPTIONS[OPT_CONF_DIR])
-        if not os.path.exists(conf_dir):
+        if create and not os.path.exists(conf_dir):
             os.makedirs(conf_dir, exist_ok=True)
         return os.path.join(os.path.abspath(conf_dir), "odoo.cfg")
 
@@ -20,32 +21,63 @@ class Config(Command):
         template_file = self._options.get(OPT_CONF_TEMPLATE, DEFAULT_OPTIONS[OPT_CONF_TEMPLATE])
         return os.path.abspath(template_file)
 
-    def run(self, args):
-        printing.info("Generating Odoo configuration file...")
-        self.load_config(args.file)
+    def render(self, args, write=True):
+        """
+        Render the Odoo configuration file without writing it
 
-        template_path = self._get_template_path()
-        config_path = self._get_config_path()
+        :param args: command line arguments
+        :param write: create the configuration directory, maintain the flattened addons directory
+            and persist the module index, nothing is written on disk otherwise
+        :return: tuple (configuration file path, content)
+        """
+        if not self._project:
+            self.load_config(args.file)
 
-        shutil.copyfile(template_path, config_path)
+        template_path = self._get_template_path()
+        config_path = self._get_config_path(create=write)
+        if not os.path.isfile(template_path):
+            raise RuntimeError("Missing Odoo configuration template {}".format(template_path))
 
         new_options = {}
-        options = self._odoo.get("options", {})
+        options = dict(self._odoo.options)
 
         data_dir = options.get("data_dir", False)
         if data_dir:
             options.pop("data_dir")
             new_options.update({"data_dir": os.path.abspath(data_dir)})
 
-        addons_path = commands_registry["addons"]()._addons_path(args)
+        addons_path = get_command("addons")()._addons_path(args, write)
         options.update({"addons_path": addons_path})
 
         new_options.update({k: v for k, v in options.items()})
 
         parser = ConfigParser()
-        parser.read(config_path)
+        parser.read(template_path)
         for k, v in new_options.items():
             parser.set("options", k, v)
+        content = io.StringIO()
+        parser.write(content)
+        return config_path, content.getvalue()
+
+    def run(self, args):
+        printing.info("Generating Odoo configuration file...")
+        self.load_config(args.file)
+        self.write(*self.render(args))
+
+    def write(self, config_path, content):
+        """
+        Write the Odoo configuration file unless its content is unchanged
+
+        Leaving an identical file untouched spares a reload of a running Odoo.
+
+        :return: whether the file was written
+        """
+        if os.path.isfile(config_path):
+            with open(config_path, "r") as configfile:
+                if configfile.read() == content:
+                    printing.info("Odoo configuration file {} is up to date".format(config_path))
+                    return False
         with open(config_path, "w+") as configfile:
-            parser.write(configfile)
+            configfile.write(content)
+        return True
 
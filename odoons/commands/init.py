@@ -1,11 +1,21 @@
-from .command import Command, commands_registry
+from .command import Command, get_jobs
+from . import get_command
+from .pull import add_pull_arguments
 
-from odoons.utils import printing
+from odoons.utils import printing, report
 from odoons.utils.config import OPT_APPLY_REQS
 
 DEFAULT_ODOO_URL = "https://github.com/odoo/odoo"
 
 
+def _read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
 class Init(Command):
     def configure_parser(self, parser):
         parser.add_argument(
@@ -18,27 +28,100 @@ class Init(Command):
             action="store_true",
             help="Skip Odoo configuration file generation",
         )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print the actions required to bring the project up to date",
+        )
+        add_pull_arguments(parser)
 
-    def run(self, args):
+    def _plan(self, args, pull, install, config, wrapper):
         """
-        Action method responsible of the ACTION_INIT sub command
+        Compare the project configuration with the state on disk
 
-        :return: None
+        Repositories are compared on presence, remote URL, branch and HEAD, requirements
+        on the hash of their last successful installation, and the generated files on
+        their content.
+
+        :return: list of (step, subject, reason) actions
         """
-        printing.info("Initializing project...")
-        self.load_config(args.file)
+        self._pull_actions = pull.pending_actions(get_jobs(args))
+        actions = [("pull", name, reason) for name, _, reason in self._pull_actions]
+        pulled = bool(actions)
+        if not pulled:
+            for name in pull.pending_precompile():
+                actions.append(("precompile", name, "sources changed"))
 
         apply_requirements = (
             OPT_APPLY_REQS in self._options
             and self._options[OPT_APPLY_REQS]
             and not args.no_requirements
         )
-        generate_config = not args.skip_config
-
-        commands_registry["pull"]().run(args)
         if apply_requirements:
-            commands_registry["install"]().run(args)
-        if generate_config:
-            commands_registry["config"]().run(args)
+            if pulled:
+                actions.append(("install", "requirements", "repositories change"))
+            else:
+                install.prepare(args)
+                for name in install.pending_requirements(args):
+                    actions.append(("install", name, "requirements changed"))
+
+        self._config = None
+        if not args.skip_config:
+            if pulled:
+                actions.append(("config", "odoo.cfg", "repositories change"))
+            else:
+                self._config = config.render(args, write=False)
+                if _read_file(self._config[0]) != self._config[1]:
+                    actions.append(("config", self._config[0], "content changed"))
+
+        self._wrapper = wrapper.render(write=False)
+        if _read_file(self._wrapper[0]) != self._wrapper[1]:
+            actions.append(("wrapper", self._wrapper[0], "content changed"))
+        return actions
+
+    def run(self, args):
+        """
+        Action method responsible of the ACTION_INIT sub command
+
+        Only the steps of the planned actions are run.
+
+        :return: None
+        """
+        printing.info("Initializing project...")
+        # Later loads of the same file hit the in-process cache: nothing is written on dry runs
+        self.load_config(args.file, write=not args.dry_run)
+
+        pull = get_command("pull")()
+        pull.prepare(args)
+        install = get_command("install")()
+        config = get_command("config")()
+        wrapper = get_command("wrapper")()
+        wrapper.load_config(args.file)
+
+        actions = self._plan(args, pull, install, config, wrapper)
+        if not actions:
+            printing.success("Project is up to date")
+            return
+        printing.info("Planned actions:")
+        for step, subject, reason in actions:
+            printing.output("  {}: {} ({})".format(step, subject, reason))
+        if args.dry_run:
+            return
 
-        commands_registry["wrapper"]().run(args)
+        steps = set(step for step, _, _ in actions)
+        if "pull" in steps:
+            paths = [path for _, path, _ in self._pull_actions if path]
+            with report.step("pull"):
+                pull.run(args, paths=paths)
+        elif "precompile" in steps:
+            pull.precompile(get_jobs(args))
+        if "install" in steps:
+            with report.step("install"):
+                install.run(args)
+        if "config" in steps:
+            with report.step("config"):
+                config.run(args)
+        if "wrapper" in steps:
+            with report.step("wrapper"):
+                printing.info("Generating wrapper...")
+                wrapper.write(*self._wrapper)
@@ -1,32 +1,175 @@
 import os
-import subprocess
+import tempfile
 
-from .command import Command
-from odoons.utils import printing
-from odoons.utils.config import ADDONS_REQ_INSTALL_CONFIG, get_git_addons_path
+from .command import Command, add_offline_argument
+from odoons.utils import printing, report
+from odoons.utils.config import OPT_MERGE_REQS
+from odoons.utils.requirements import (
+    MergedRequirements,
+    get_requirements_file,
+    get_requirements_hash,
+    is_satisfied,
+    read_requirements,
+)
+from odoons.utils.state import load_state, dump_state
+
+REQUIREMENTS_STATE = "requirements"
+MERGED_STATE_KEY = "merged"
 
 
 class Install(Command):
-    def run(self, args):
+    _state = None
+    _pip_options = ()
+
+    def configure_parser(self, parser):
+        parser.add_argument(
+            "--merged",
+            action="store_true",
+            help="Merge every requirements files and install them through a single pip resolution",
+        )
+        add_offline_argument(parser)
+
+    def _get_requirements_files(self):
         """
-        Action method responsible of the ACTION_INSTALL sub command
+        Collect requirements files of addons (honouring install-requirements), Odoo and project root
 
+        :return: list of (requirements file path, name) tuples
+        """
+        paths = []
+        for addons in self._addons:
+            if addons.install_requirements:
+                paths.append((addons.repository_path, addons.name))
+        paths.append((self._odoo.path, "odoo"))
+        paths.append((".", "project root"))
+
+        files = []
+        installed_paths = set()
+        for path, name in paths:
+            abspath = os.path.abspath(path)
+            if abspath in installed_paths:
+                continue
+            installed_paths.add(abspath)
+            req_file_path = get_requirements_file(abspath)
+            if req_file_path:
+                files.append((req_file_path, name))
+            else:
+                printing.warning("No requirements file for {}".format(name))
+        return files
+
+    def _install_merged(self, files):
+        """
+        Install the given requirements files through a single pip call
+
+        Conflicting version pins are reported and nothing is installed. Files whose
+        relative paths cannot be rewritten are installed separately afterwards.
+
+        :param files: list of (requirements file path, name) tuples
         :return: None
         """
-        printing.info("Installing python dependencies...")
+        merged = MergedRequirements()
+        for req_file_path, name in files:
+            merged.add_file(req_file_path, name)
+
+        conflicts = merged.conflicts()
+        if conflicts:
+            for name, marker, pins in conflicts:
+                printing.error("Conflicting pins for {}{}:".format(name, "; " + marker if marker else ""))
+                for pin, sources in pins.items():
+                    printing.error("  {} required by {}".format(pin, ", ".join(sources)))
+            raise RuntimeError("Conflicting requirements, nothing has been installed")
+
+        lines = merged.lines()
+        if lines and not self._is_up_to_date(MERGED_STATE_KEY, lines, "merged requirements"):
+            with tempfile.NamedTemporaryFile("w", prefix="odoons-", suffix=".txt", delete=False) as file:
+                file.write(os.linesep.join(lines))
+            try:
+                report.run(["pip", "install", "-r", file.name] + list(self._pip_options), "pip", check=True)
+            finally:
+                os.unlink(file.name)
+            self._save_state(MERGED_STATE_KEY, lines)
+
+        for req_file_path, name in merged.separate_files:
+            printing.warning("Requirements of {} use relative file: URLs, installing them separately".format(name))
+            self._install_file(req_file_path, name)
+
+    def _install_file(self, req_file_path, name):
+        lines = read_requirements(req_file_path)
+        if self._is_up_to_date(req_file_path, lines, name):
+            return
+        report.run(["pip", "install", "-r", req_file_path] + list(self._pip_options), "pip", check=True)
+        self._save_state(req_file_path, lines)
+
+    def _is_up_to_date(self, key, lines, name):
+        """
+        Check whether pip can be skipped for the given requirements
+
+        pip is skipped when the requirements did not change since the last successful
+        installation and the installed distributions still satisfy them.
+
+        :param key: state key of the requirements
+        :param lines: requirements lines
+        :param name: name used in messages
+        :return: bool
+        """
+        if self._is_installed(key, lines):
+            printing.info("Requirements of {} already satisfied".format(name))
+            return True
+        return False
+
+    def _is_installed(self, key, lines):
+        return self._state.get(key) == get_requirements_hash(lines) and is_satisfied(lines)
+
+    def _is_merged(self, args):
+        return getattr(args, "merged", False) or self._options.get(OPT_MERGE_REQS, False)
+
+    def prepare(self, args):
         self.load_config(args.file)
+        self._state = load_state(self._options, REQUIREMENTS_STATE)
+        if getattr(args, "offline", False):
+            # Install from local wheels and sources only (e.g. PIP_FIND_LINKS)
+            self._pip_options = ("--no-index",)
 
-        def pip_install(path, addons_name):
-            req_file_path = os.path.join(path, "requirements.txt")
-            if os.path.exists(req_file_path) and os.path.isfile(req_file_path):
-                subprocess.run(["pip", "install", "-r", req_file_path], check=True)
-            else:
-                printing.warning("No requirements file for {}".format(addons_name))
+    def pending_requirements(self, args):
+        """
+        List requirements which would be installed, without installing anything
+
+        :return: list of names of the requirements to install
+        """
+        files = self._get_requirements_files()
+        if self._is_merged(args):
+            merged = MergedRequirements()
+            for req_file_path, name in files:
+                merged.add_file(req_file_path, name)
+            pending = [
+                name
+                for req_file_path, name in merged.separate_files
+                if not self._is_installed(req_file_path, read_requirements(req_file_path))
+            ]
+            if merged.conflicts() or not self._is_installed(MERGED_STATE_KEY, merged.lines()):
+                pending.insert(0, "merged requirements")
+            return pending
+        return [
+            name
+            for req_file_path, name in files
+            if not self._is_installed(req_file_path, read_requirements(req_file_path))
+        ]
+
+    def _save_state(self, key, lines):
+        self._state[key] = get_requirements_hash(lines)
+        dump_state(self._options, REQUIREMENTS_STATE, self._state)
 
-        for name, conf in self._addons.items():
-            if conf.get(ADDONS_REQ_INSTALL_CONFIG, True):
-                abspath = get_git_addons_path(conf)
-                pip_install(abspath, name)
+    def run(self, args):
+        """
+        Action method responsible of the ACTION_INSTALL sub command
+
+        :return: None
+        """
+        printing.info("Installing python dependencies...")
+        self.prepare(args)
+        files = self._get_requirements_files()
+        if self._is_merged(args):
+            self._install_merged(files)
+            return
 
-        pip_install(self._odoo["path"], "odoo")
-        pip_install(".", "project root")
+        for req_file_path, name in files:
+            self._install_file(req_file_path, name)
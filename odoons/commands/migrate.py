@@ -1,149 +1,308 @@
+import configparser
+import glob
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from ruamel.yaml import YAML
 
-from .command import Command
+from .command import Command, add_jobs_argument, get_jobs
 
 from odoons.utils import printing
 from odoons.utils.config import get_config_parser, DEFAULT_OPTIONS
 
+BUILDOUT_FILE = "buildout.cfg"
+
+# Parsed buildout files shared by every migrated project: path -> ([mtime, size], sections)
+_buildout_files = {}
+_buildout_files_lock = threading.Lock()
+
 
 def is_sha1_string(value):
     pattern = re.compile(r"\b[0-9a-f]{40}\b")
     return bool(re.match(pattern, value))
 
 
-class Migrate(Command):
+def read_buildout_file(buildout_file):
+    """
+    Parse the buildout and odoo sections of the given buildout file
+
+    Parsed files are cached by path, modification time and size so base files shared
+    by several projects are only read once.
+
+    :param buildout_file: buildout file path
+    :return: tuple (buildout section dict() or None, odoo section list of (key, value) or None)
+    """
+    path = os.path.abspath(buildout_file)
+    try:
+        stat = os.stat(path)
+        key = [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        key = None
+    with _buildout_files_lock:
+        cached = _buildout_files.get(path)
+        if cached and key and cached[0] == key:
+            return cached[1]
+
+    parser = get_config_parser()
+    parser.read(path)
+    sections = (
+        dict(parser.items("buildout")) if parser.has_section("buildout") else None,
+        parser.items("odoo") if parser.has_section("odoo") else None,
+    )
+    if key:
+        with _buildout_files_lock:
+            _buildout_files[path] = (key, sections)
+    return sections
+
+
+def get_buildout_file_hierarchy(buildout_file, data=None):
+    """
+    Build the buildout file hiearchy for top to bottom
+
+    :param buildout_file: starting buildout file path
+    :param data: list of buildout file hierarchy (recusion accumulator)
+    :return: list(str)
+    """
+    data = [buildout_file] + (data or [])
+    buildout_section, _ = read_buildout_file(buildout_file)
+    if buildout_section is None:
+        raise RuntimeError("Invalid buildout file {}: missing buildout section".format(buildout_file))
+    if "extends" in buildout_section:
+        extend_file = os.path.join(os.path.dirname(buildout_file), buildout_section["extends"])
+        return get_buildout_file_hierarchy(extend_file, data)
+
+    return data
+
+
+def is_project_buildout(buildout_file):
+    """
+    Check whether the given buildout file defines a project: its hierarchy must define
+    the addons of the odoo part (base files extended by projects usually do not)
+
+    :param buildout_file: buildout file path
+    :return: bool
+    """
+    try:
+        files = get_buildout_file_hierarchy(buildout_file)
+        return any(dict(read_buildout_file(file)[1] or []).get("addons") for file in files)
+    except (RuntimeError, configparser.Error):
+        return False
+
+
+def migrate_buildout(buildout_file):
+    """
+    Convert the given buildout file (and the files it extends) to odoons YAML data
+
+    :param buildout_file: buildout file path
+    :return: tuple (odoons YAML data dict(), list of warnings)
+    """
+    warnings = []
+    extends_list = get_buildout_file_hierarchy(buildout_file)
+    odoo_config = dict()
+    # Read buildout file hierarchy from top to bottom
+    for file in extends_list:
+        _, odoo_section = read_buildout_file(file)
+        if odoo_section:
+            odoo_config.update(odoo_section)
+
+    odoons_data = {"odoons": dict()}
+
+    # Odoo YAML section
+    version = odoo_config.get("version", None)
+    if not version:
+        raise RuntimeError("Unidentified Odoo version: check version key on buildout file")
+    splited_value = version.split(" ")
+    odoons_data["odoons"]["odoo"] = dict(
+        {
+            "version": splited_value[3],
+            "url": splited_value[1],
+            "path": "parts/"
+            + splited_value[2],  # Hardcoding parts: ts not obvious where it is defined on buildout file
+        }
+    )
+
+    # Odoo - options YAML section
+    options = {}
+    options_prefix = "options."
+    for key, value in odoo_config.items():
+        if key.startswith(options_prefix):
+            options[key[len(options_prefix) :]] = value
+    if options:
+        odoons_data["odoons"]["odoo"]["options"] = options
+
+    # Options YAML section
+    odoons_data["odoons"]["options"] = dict(DEFAULT_OPTIONS)
+
+    # Addons YAML section
+    addons = odoo_config.get("addons", None)
+    revisions = odoo_config.get("revisions", "")
+    if not addons:
+        raise RuntimeError("No addons defined on buildout file. Does migrate the file still useful ?")
+    revisions_dict = {}
+    if revisions:
+        for value in revisions.split("\n"):
+            items = value.split(" ")
+            # Commit hash only applies to Odoo repository
+            if len(items) == 1:
+                odoons_data["odoons"]["odoo"]["commit"] = items[0]
+            if len(items) == 2:
+                revisions_dict[items[0]] = items[1]
+
+    buildout_addons_list = addons.split("\n")
+    addons = {}
+    for buildout_addons in buildout_addons_list:
+        items = buildout_addons.split(" ")
+        addons_type, *addons_config = items
+        if addons_type == "git":
+            # [ 'git', URL, PATH, REVISION, [OPTIONS] ]
+            git_url, path, revision, *addons_options = addons_config
+            d = dict({"type": "git", "path": path, "url": git_url})
+            addons_name = os.path.basename(os.path.normpath(path))
+
+            if is_sha1_string(revision):
+                d.update(commit=revision)
+            else:
+                d.update(branch=revision)
+
+            # Revision has been set apply it
+            if path in revisions_dict:
+                d["commit"] = revisions_dict[path]
 
+            try:
+                for option in addons_options:
+                    prefix = "group="
+                    if option.startswith(prefix):
+                        group_value = option[len(prefix) :]
+                        base_path = os.path.dirname(path)
+                        d["path"] = os.path.join(base_path, group_value)
+                        d["standalone"] = addons_name
+                    else:
+                        warnings.append("Unknown addons options: " + option)
+            except IndexError:
+                pass
+            addons[addons_name] = d
+            continue
+        elif addons_type == "local" and len(addons_config) == 1:
+            # [ 'local', PATH ]
+            addons_path = addons_config[0]
+            d = {"type": "local", "path": addons_path}
+            name = os.path.basename(os.path.normpath(d["path"]))
+            addons[name] = d
+            continue
+        else:
+            warnings.append("Unprocessable addons config: {}".format(items))
+    odoons_data["odoons"]["addons"] = addons
+    return odoons_data, warnings
+
+
+def dump_odoons_file(path, data):
+    yaml = YAML(typ="safe")
+    yaml.default_flow_style = False
+    yaml.indent(mapping=2, sequence=4, offset=2)
+    with open(path, "w") as outfile:
+        yaml.dump(data, outfile)
+
+
+def find_buildout_files(pattern):
+    """
+    Find the buildout files of the projects matching the given directory or glob pattern
+
+    A directory is searched recursively for `buildout.cfg` files. Glob matches are
+    either buildout files or project directories containing a `buildout.cfg` file.
+
+    :param pattern: directory or glob pattern
+    :return: sorted list of buildout file paths
+    """
+    if os.path.isdir(pattern):
+        files = glob.glob(os.path.join(pattern, "**", BUILDOUT_FILE), recursive=True)
+    else:
+        files = []
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isdir(path):
+                path = os.path.join(path, BUILDOUT_FILE)
+            if os.path.isfile(path):
+                files.append(path)
+    return sorted(set(files))
+
+
+class Migrate(Command):
     def configure_parser(self, parser):
-        parser.add_argument("buildout_file", help="Odoo buildout file to migrate")
+        parser.add_argument(
+            "buildout_file",
+            help="Odoo buildout file to migrate, or directory / glob pattern of several projects to migrate",
+        )
+        add_jobs_argument(parser)
 
-    def _get_buildout_file_hierarchy(self, buildout_file, data):
+    def _migrate_project(self, buildout_file, output_name):
         """
-        Build the buildout file hiearchy for top to bottom
+        Migrate a single project of a batch, next to its buildout file
 
-        :param buildout_file: starting buildout file path
-        :param data: list of buildout file hierarchy (recusion accumulator)
-        :return: list(str)
+        :return: tuple (output path, list of warnings, error message or None)
         """
-        data = [buildout_file] + data
-        buildout_parser = get_config_parser()
-        buildout_parser.read(buildout_file)
-        if not buildout_parser.has_section("buildout"):
-            raise RuntimeError("Invalid buildout file: missing buildout section")
-        buildout_section = dict(buildout_parser.items("buildout"))
-        if "extends" in buildout_section:
-            extend_file = os.path.join(os.path.dirname(buildout_file), buildout_section["extends"])
-            return self._get_buildout_file_hierarchy(extend_file, data)
-
-        return data
+        output_path = os.path.join(os.path.dirname(buildout_file), output_name)
+        try:
+            data, warnings = migrate_buildout(buildout_file)
+            dump_odoons_file(output_path, data)
+        except Exception as e:
+            return output_path, [], str(e) or e.__class__.__name__
+        return output_path, warnings, None
+
+    def _migrate_batch(self, buildout_files, output_name, jobs):
+        """
+        Migrate several projects in parallel and print a summary
+
+        :param buildout_files: buildout file of every project
+        :param output_name: odoons YAML file name written next to every buildout file
+        :param jobs: maximum number of projects migrated concurrently
+        :return: None
+        """
+        printing.info("Migrating {} buildout projects to Odoons...".format(len(buildout_files)))
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(lambda file: self._migrate_project(file, output_name), buildout_files))
+
+        failures = 0
+        for buildout_file, (output_path, warnings, error) in zip(buildout_files, results):
+            if error:
+                failures += 1
+                printing.error("{}: {}".format(buildout_file, error))
+                continue
+            printing.success("{} -> {}".format(buildout_file, output_path))
+            for warning in warnings:
+                printing.warning("  " + warning)
+        printing.info(
+            "{} projects migrated, {} with warnings, {} failed".format(
+                len(results) - failures, len([result for result in results if result[1]]), failures
+            )
+        )
+        if failures:
+            raise RuntimeError("{} buildout projects could not be migrated".format(failures))
 
     def run(self, args):
         """
         Migrate the given buildout file to an YAML Odoons compatible file
 
+        A directory or glob pattern migrates every matching project in parallel, each
+        odoons YAML file being written next to its buildout file.
+
         :return: None
         """
-        printing.info("Migrating buildout file to Odoons...")
-        extends_list = self._get_buildout_file_hierarchy(args.buildout_file, [])
-        odoo_config = dict()
-        # Read buildout file hierarchy from top to bottom
-        for file in extends_list:
-            file_parser = get_config_parser()
-            file_parser.read(file)
-            if file_parser.has_section("odoo"):
-                odoo_config.update(file_parser.items("odoo"))
-
-        odoons_data = {"odoons": dict()}
-
-        # Odoo YAML section
-        version = odoo_config.get("version", None)
-        if not version:
-            raise RuntimeError("Unidentified Odoo version: check version key on buildout file")
-        splited_value = version.split(" ")
-        odoons_data["odoons"]["odoo"] = dict(
-            {
-                "version": splited_value[3],
-                "url": splited_value[1],
-                "path": "parts/"
-                + splited_value[2],  # Hardcoding parts: ts not obvious where it is defined on buildout file
-            }
-        )
+        if not os.path.isfile(args.buildout_file):
+            buildout_files = find_buildout_files(args.buildout_file)
+            if not buildout_files:
+                raise RuntimeError("No buildout file found for {}".format(args.buildout_file))
+            projects = [file for file in buildout_files if is_project_buildout(file)]
+            for buildout_file in buildout_files:
+                if buildout_file not in projects:
+                    printing.warning("{} does not define odoo addons, skipping".format(buildout_file))
+            if not projects:
+                raise RuntimeError("No buildout project found for {}".format(args.buildout_file))
+            buildout_files = projects
+            self._migrate_batch(buildout_files, os.path.basename(args.file), get_jobs(args))
+            return
 
-        # Odoo - options YAML section
-        options = {}
-        options_prefix = "options."
-        for key, value in odoo_config.items():
-            if key.startswith(options_prefix):
-                options[key[len(options_prefix) :]] = value
-        if options:
-            odoons_data["odoons"]["odoo"]["options"] = options
-
-        # Options YAML section
-        odoons_data["odoons"]["options"] = dict(DEFAULT_OPTIONS)
-
-        # Addons YAML section
-        addons = odoo_config.get("addons", None)
-        revisions = odoo_config.get("revisions", "")
-        if not addons:
-            raise RuntimeError("No addons defined on buildout file. Does migrate the file still useful ?")
-        revisions_dict = {}
-        if revisions:
-            for value in revisions.split("\n"):
-                items = value.split(" ")
-                # Commit hash only applies to Odoo repository
-                if len(items) == 1:
-                    odoons_data["odoons"]["odoo"]["commit"] = items[0]
-                if len(items) == 2:
-                    revisions_dict[items[0]] = items[1]
-
-        buildout_addons_list = addons.split("\n")
-        addons = {}
-        for buildout_addons in buildout_addons_list:
-            items = buildout_addons.split(" ")
-            addons_type, *addons_config = items
-            if addons_type == "git":
-                # [ 'git', URL, PATH, REVISION, [OPTIONS] ]
-                git_url, path, revision, *addons_options = addons_config
-                d = dict({"type": "git", "path": path, "url": git_url})
-                addons_name = os.path.basename(os.path.normpath(path))
-
-                if is_sha1_string(revision):
-                    d.update(commit=revision)
-                else:
-                    d.update(branch=revision)
-
-                # Revision has been set apply it
-                if path in revisions_dict:
-                    d["commit"] = revisions_dict[path]
-
-                try:
-                    for option in addons_options:
-                        prefix = "group="
-                        if option.startswith(prefix):
-                            group_value = option[len(prefix) :]
-                            base_path = os.path.dirname(path)
-                            d["path"] = os.path.join(base_path, group_value)
-                            d["standalone"] = addons_name
-                        else:
-                            printing.warning("Unknown addons options: " + option)
-                except IndexError:
-                    pass
-                addons[addons_name] = d
-                continue
-            elif addons_type == "local" and len(addons_config) == 1:
-                # [ 'local', PATH ]
-                addons_path = addons_config[0]
-                d = {"type": "local", "path": addons_path}
-                name = os.path.basename(os.path.normpath(d["path"]))
-                addons[name] = d
-                continue
-            else:
-                printing.warning("Unprocessable addons config: {}".format(items))
-        odoons_data["odoons"]["addons"] = addons
-
-        yaml = YAML(typ="safe")
-        yaml.default_flow_style = False
-        yaml.indent(mapping=2, sequence=4, offset=2)
-        with open(args.file, "w") as outfile:
-            yaml.dump(odoons_data, outfile)
+        printing.info("Migrating buildout file to Odoons...")
+        odoons_data, warnings = migrate_buildout(args.buildout_file)
+        for warning in warnings:
+            printing.warning(warning)
+        dump_odoons_file(args.file, odoons_data)
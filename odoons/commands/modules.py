@@ -0,0 +1,48 @@
+from .command import Command
+
+from odoons.utils import printing
+from odoons.utils.modules import ModuleIndex
+
+ACTION_LIST = "list"
+ACTION_DUPLICATES = "duplicates"
+ACTION_TREE = "tree"
+
+
+class Modules(Command):
+    def configure_parser(self, parser):
+        parser.add_argument(
+            "action",
+            nargs="?",
+            default=ACTION_LIST,
+            choices=[ACTION_LIST, ACTION_DUPLICATES, ACTION_TREE],
+            help="list modules, find modules provided by several addons paths or show a module dependency tree",
+        )
+        parser.add_argument("module", nargs="?", help="Module name (tree action)")
+        parser.add_argument("--rescan", action="store_true", help="Rescan every addons path")
+
+    def _list(self, index):
+        for name, (path, info) in sorted(index.modules().items()):
+            print("{} {} {}".format(name, info["version"], path))
+
+    def _duplicates(self, index):
+        for name, paths in sorted(index.duplicates().items()):
+            print("{}: {}".format(name, ", ".join(paths)))
+
+    def _tree(self, index, module):
+        if not module:
+            raise RuntimeError("Missing module name for the tree action")
+        for depth, name, found in index.dependency_tree(module):
+            print("{}{}{}".format("  " * depth, name, "" if found else " (missing)"))
+
+    def run(self, args):
+        self.load_config(args.file)
+        index = ModuleIndex(self._project)
+        for path in index.refresh(force=args.rescan):
+            printing.debug("Scanned {}".format(path))
+
+        if args.action == ACTION_DUPLICATES:
+            self._duplicates(index)
+        elif args.action == ACTION_TREE:
+            self._tree(index, args.module)
+        else:
+            self._list(index)
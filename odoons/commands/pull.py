@@ -1,62 +1,315 @@
 import os
-import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from .command import Command
+from .command import Command, add_jobs_argument, add_offline_argument, get_jobs
 
-from odoons.utils import printing
+from odoons.utils import printing, report, ssh
 from odoons.utils.git import Git
-from odoons.utils.config import OPT_INSTALL_ODOO, OPT_APPLY_REQS, get_git_addons_path
+from odoons.utils.mirror import evict_mirrors
+from odoons.utils.precompile import DEFAULT_INVALIDATION_MODE, get_pending_targets, precompile
+from odoons.utils.requirements import is_editable_install
+from odoons.utils.lock import ODOO_LOCK_KEY, get_lock_path, load_lock, dump_lock, lock_entry
+from odoons.utils.project import ODOO_NAME
+from odoons.utils.config import (
+    OPT_INSTALL_ODOO,
+    OPT_APPLY_REQS,
+    OPT_GIT_BACKEND,
+    OPT_MIRROR_DIR,
+    OPT_MIRROR_MAX_AGE,
+    OPT_PRECOMPILE,
+    OPT_PRECOMPILE_INVALIDATION,
+    OPT_SSH_MULTIPLEXING,
+)
 
 
-DEFAULT_ODOO_URL = "https://github.com/odoo/odoo"
+def add_pull_arguments(parser):
+    add_jobs_argument(parser)
+    parser.add_argument(
+        "--locked",
+        action="store_true",
+        help="Check out the commits recorded in the lock file instead of resolving branches",
+    )
+    add_offline_argument(parser)
 
 
 class Pull(Command):
+    _gits = None
+    _lock = None
+    _locked = False
+    _offline = False
 
-    def _init_odoo(self):
-        printing.info("Cloning Odoo core...")
-        abspath = os.path.abspath(self._odoo["path"])
-        url = self._odoo.get("url", DEFAULT_ODOO_URL)
-        branch = self._odoo["version"]
-        commit = self._odoo.get("commit", None)
+    def configure_parser(self, parser):
+        add_pull_arguments(parser)
 
-        Git(abspath, url, branch, commit).clone()
+    def _load_lock(self, args):
+        self._lock_path = get_lock_path(args.file)
+        self._lock = load_lock(self._lock_path) or {ODOO_LOCK_KEY: {}, "addons": {}}
+        self._locked = getattr(args, "locked", False)
+        if self._locked and not os.path.isfile(self._lock_path):
+            raise RuntimeError("Missing lock file {}".format(self._lock_path))
 
+    def _git(self, repository, locked, source=None):
+        """
+        Build a Git object taking the lock file entry into account
+
+        The locked commit is only considered when the lock entry still matches the
+        configured URL and branch. With `--locked`, branch tracking entries are
+        frozen to their locked commit.
+
+        :param repository: Repository record
+        :param locked: lock file entry dict
+        :param source: path of a checkout of the same URL and revision to clone and fetch from
+        :return: Git
+        """
+        commit = repository.commit
+        locked_commit = None
+        if locked.get("url") == repository.url and locked.get("branch") == repository.branch:
+            locked_commit = locked.get("commit")
+        if self._locked and not commit:
+            if not locked_commit:
+                raise RuntimeError(
+                    "Lock file is out of date for {}: run odoons without --locked".format(repository.names[0])
+                )
+            commit = locked_commit
+        return Git(
+            repository.path,
+            repository.url,
+            repository.branch,
+            commit,
+            mirror_dir=self._options.get(OPT_MIRROR_DIR),
+            locked_commit=locked_commit,
+            partial=repository.partial,
+            sparse=repository.sparse,
+            offline=self._offline,
+            backend=self._options.get(OPT_GIT_BACKEND),
+            source=source,
+        )
+
+    def _odoo_git(self):
+        return self._git(self._project.odoo_repository, self._lock[ODOO_LOCK_KEY])
+
+    def _repository_gits(self):
+        """
+        Build Git objects for Odoo core and every physical addons repository, once per Pull
+
+        Git objects are shared by the pending actions and the pull itself so every
+        remote is only probed once.
+
+        :return: list of (Repository, Git) tuples, Odoo core first
+        """
+        if self._gits is None:
+            self._gits = [(self._project.odoo_repository, self._odoo_git())] + self._addons_gits()
+        return self._gits
+
+    def _sources(self):
+        """
+        Find addons repositories checked out several times at the same URL and revision
+
+        This happens with `standalone` entries of a same repository, which use distinct
+        paths. Only the first checkout accesses the remote, the other ones are cloned and
+        fetched locally from it. A mirror directory already fetches each URL once.
+
+        :return: dict() repository path -> source repository path
+        """
+        if self._options.get(OPT_MIRROR_DIR):
+            return {}
+        sources = {}
+        first_paths = {}
+        for repository in self._project.repositories:
+            key = (repository.url, repository.branch, repository.commit, repository.partial, repository.sparse)
+            first_path = first_paths.setdefault(key, repository.path)
+            if first_path != repository.path:
+                sources[repository.path] = first_path
+        return sources
+
+    def _addons_gits(self):
+        """
+        Build Git objects for every physical addons repository
+
+        Entries sharing the same repository are grouped so it is only processed once.
+
+        :return: list of (Repository, Git) tuples
+        """
+        gits = []
+        sources = self._sources()
+        for repository in self._project.repositories:
+            names = repository.names
+            locked = next((self._lock["addons"][name] for name in names if name in self._lock["addons"]), {})
+            gits.append((repository, self._git(repository, locked, sources.get(repository.path))))
+        return gits
+
+    def _write_lock(self, odoo_git, addons_gits):
+        """
+        Record resolved commits of every repository in the lock file
+
+        Entries of repositories which could not be resolved keep their previous value.
+
+        :return: None
+        """
+        odoo_commit = odoo_git.head()
+        data = {
+            ODOO_LOCK_KEY: self._lock[ODOO_LOCK_KEY],
+            "addons": {},
+        }
+        if odoo_commit:
+            data[ODOO_LOCK_KEY] = lock_entry(self._odoo.url, self._odoo.version, odoo_commit)
+        for repository, git in addons_gits:
+            commit = git.head()
+            for name in repository.names:
+                if commit:
+                    data["addons"][name] = lock_entry(repository.url, repository.branch, commit)
+                elif name in self._lock["addons"]:
+                    data["addons"][name] = self._lock["addons"][name]
+        dump_lock(self._lock_path, data)
+
+    def _clone_after(self, source_future, name, git, buffered):
+        if source_future is not None:
+            source_future.result()
+        return self._clone(name, git, buffered)
+
+    def _clone(self, name, git, buffered):
+        if git.is_shared():
+            printing.info("{} is a shared workspace checkout, skipping".format(name))
+            return 0
+        if not buffered:
+            printing.info("Initializing {}...".format(name))
+            with report.step("repository", repo=name):
+                return git.clone()
+        with printing.buffered(), report.step("repository", repo=name):
+            printing.info("Initializing {}...".format(name))
+            return git.clone()
+
+    def _is_odoo_installed(self):
+        return not self._options.get(OPT_INSTALL_ODOO, False) or is_editable_install("odoo", self._odoo.path)
+
+    def _install_odoo(self):
         if self._options.get(OPT_INSTALL_ODOO, False):
+            abspath = self._odoo.path
+            if is_editable_install("odoo", abspath):
+                printing.info("Odoo command already installed from {}".format(abspath))
+                return
             printing.info("Installing odoo command...")
-            subprocess.run(["pip", "install", "-e", abspath, "--no-deps"], check=True)
+            command = ["pip", "install", "-e", abspath, "--no-deps"]
+            if self._offline:
+                command += ["--no-index"]
+            report.run(command, "pip", check=True)
 
-    def _init_addons(self):
-        printing.info("Cloning addons...")
-        potential_errors = []
-        for name, conf in self._addons.items():
-            printing.info("Initializing {}...".format(name))
-            conf_type = conf["type"]
-            if conf_type == "git":
-                abspath = get_git_addons_path(conf)
-                git = Git(
-                    abspath,
-                    conf["url"],
-                    conf.get("branch", None),
-                    conf.get("commit", None),
+    def _precompile_mode(self):
+        return self._options.get(OPT_PRECOMPILE_INVALIDATION, DEFAULT_INVALIDATION_MODE)
+
+    def pending_precompile(self):
+        """
+        :return: names of the repositories whose bytecode is outdated, empty when precompilation is disabled
+        """
+        if not self._options.get(OPT_PRECOMPILE, False):
+            return []
+        targets = get_pending_targets(self._options, self._project, self._precompile_mode())
+        return [name for name, _, _ in targets]
+
+    def precompile(self, jobs):
+        """
+        Compile the bytecode of Odoo and addons when the precompile option is enabled
+
+        :param jobs: number of compiling processes
+        :return: None
+        """
+        if not self._options.get(OPT_PRECOMPILE, False):
+            return
+        with report.step("precompile"):
+            precompile(self._options, self._project, self._precompile_mode(), jobs)
+
+    def pending_actions(self, jobs):
+        """
+        List what pulling would change, without modifying anything
+
+        Repositories are probed concurrently and the probed remote branches are reused
+        when pulling afterwards.
+
+        :param jobs: maximum number of repositories probed concurrently
+        :return: list of (name, repository path or None, reason) tuples
+        """
+        actions = []
+        sources = self._sources()
+        pending = {}
+        gits = self._repository_gits()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            reasons = list(executor.map(lambda item: item[1].pending_update(), gits))
+        for (repository, git), reason in zip(gits, reasons):
+            if not reason and sources.get(repository.path) in pending:
+                reason = "source {} changes".format(pending[sources[repository.path]])
+            if reason:
+                name = ", ".join(repository.names)
+                pending[repository.path] = name
+                actions.append((name, repository.path, reason))
+        if not self._is_odoo_installed():
+            actions.append((ODOO_NAME, None, "install odoo command"))
+        return actions
+
+    def _init_repositories(self, jobs, paths=None):
+        """
+        Clone or update Odoo core and addons repositories using a bounded pool of workers
+
+        Odoo core is submitted first as it is by far the biggest repository. Repositories
+        with a local source are processed once their source is.
+
+        :param jobs: maximum number of repositories processed concurrently
+        :param paths: optional repository paths to process, other repositories are left untouched
+        :return: None
+        """
+        printing.info("Cloning Odoo core and addons...")
+        buffered = jobs > 1
+        gits = self._repository_gits()
+        odoo_git = gits[0][1]
+        addons_gits = gits[1:]
+        potential_errors = [name for name, _ in self._project.conflicts]
+        sources = self._sources()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = OrderedDict()
+            for repository, git in gits:
+                if paths is not None and repository.path not in paths:
+                    continue
+                name = ", ".join(repository.names)
+                # Sources are submitted first: a waiting worker never blocks a queued source
+                source_future = futures.get(sources.get(repository.path), (None, None))[1]
+                futures[repository.path] = (
+                    name,
+                    executor.submit(self._clone_after, source_future, name, git, buffered),
                 )
-                returncode = git.clone()
-                if returncode != 0:
-                    potential_errors.append((name, conf))
+            for name, future in futures.values():
+                if future.result() != 0:
+                    potential_errors.append(name)
+
+        if not self._locked:
+            self._write_lock(odoo_git, addons_gits)
+
+        self._install_odoo()
+        self.precompile(jobs)
+
+        mirror_dir = self._options.get(OPT_MIRROR_DIR)
+        if mirror_dir:
+            evict_mirrors(mirror_dir, self._options.get(OPT_MIRROR_MAX_AGE))
 
         if potential_errors:
             printing.warning("Some addons repository cloning seems to have issues")
             printing.warning("Check execution logs for the following:")
-            for name, conf in potential_errors:
+            for name in potential_errors:
                 printing.warning(name)
 
-    def run(self, args):
+    def run(self, args, paths=None):
         """
         Action method responsible of the ACTION_INIT sub command
 
+        :param paths: optional repository paths to pull, all repositories by default
         :return: None
         """
         printing.info("Initializing project...")
+        self.prepare(args)
+        self._init_repositories(get_jobs(args), paths)
+
+    def prepare(self, args):
         self.load_config(args.file)
-        self._init_odoo()
-        self._init_addons()
+        self._load_lock(args)
+        self._offline = getattr(args, "offline", False)
+        if not self._offline and self._options.get(OPT_SSH_MULTIPLEXING, False):
+            ssh.enable()
@@ -1,25 +1,158 @@
+import errno
 import os
 import shutil
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from .command import Command
+from .command import Command, add_jobs_argument, get_jobs
 import odoons.utils.printing as printing
+from odoons.utils import gitstate
+from odoons.utils.config import OPT_GIT_BACKEND
+from odoons.utils.git import Git
+from odoons.utils.precompile import clear_precompile_state
+from odoons.utils.project import ADDONS_TYPE_GIT
+from odoons.utils.state import get_state_dir
+
+TRASH_DIRECTORY = "trash"
 
 
 class Reset(Command):
-    def run(self, args):
-        self.load_config(args.file)
+    def configure_parser(self, parser):
+        parser.add_argument(
+            "--soft",
+            action="store_true",
+            help="Keep checkouts and restore them in place (git reset --hard and git clean -ffdx)",
+        )
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="Delete directories before returning instead of deleting them in background",
+        )
+        add_jobs_argument(parser)
 
-        printing.info("Deleting remote addons...")
+    def _soft_reset(self, jobs):
+        """
+        Restore Odoo and every git addons repository in place, in parallel
+
+        :param jobs: maximum number of repositories processed concurrently
+        :return: None
+        """
+        printing.info("Restoring remote addons...")
+        repositories = [self._project.odoo_repository] + list(self._project.repositories)
 
-        def reset_path(path):
+        def reset_repository(repository):
+            with printing.buffered():
+                printing.info("Restoring {}...".format(", ".join(repository.names)))
+                if not os.path.isdir(repository.path):
+                    printing.warning("Path {} seems already deleted".format(repository.path))
+                    return 0
+                if os.path.islink(repository.path):
+                    printing.info("{} is a shared workspace checkout, skipping".format(repository.path))
+                    return 0
+                return Git(
+                    repository.path,
+                    repository.url,
+                    partial=repository.partial,
+                    sparse=repository.sparse,
+                    backend=self._options.get(OPT_GIT_BACKEND),
+                ).reset_clean()
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            returncodes = list(executor.map(reset_repository, repositories))
+        # git clean deleted the precompiled bytecode
+        clear_precompile_state(self._options, [repository.path for repository in repositories])
+        for repository, returncode in zip(repositories, returncodes):
+            if returncode != 0:
+                printing.warning("Restoring {} seems to have issues".format(", ".join(repository.names)))
+
+    def _move_to_trash(self, paths):
+        """
+        Rename the given directories into a new trash directory
+
+        Renaming is immediate. Directories which cannot be renamed (e.g. on another
+        file system) are returned to be deleted in place.
+
+        :param paths: directories to delete
+        :return: tuple (trash directory, list of directories not moved)
+        """
+        trash_dir = os.path.join(
+            get_state_dir(self._options), TRASH_DIRECTORY, "{}-{}".format(int(time.time()), uuid.uuid4().hex[:8])
+        )
+        os.makedirs(trash_dir, exist_ok=True)
+        not_moved = []
+        for index, path in enumerate(paths):
+            gitstate.invalidate(path)
+            if os.path.islink(path):
+                # Shared workspace checkout: only the link belongs to the project
+                os.unlink(path)
+                continue
             try:
-                shutil.rmtree(path)
-            except FileNotFoundError:
-                printing.warning("Path {} seems already deleted".format(path))
-
-        odoo_path = os.path.abspath(self._odoo["path"])
-        reset_path(odoo_path)
-        for name, conf in self._addons.items():
-            if conf["type"] == "git":
-                abspath = os.path.abspath(conf["path"])
-                reset_path(abspath)
+                os.rename(path, os.path.join(trash_dir, "{}-{}".format(index, os.path.basename(path))))
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    printing.warning("Path {} seems already deleted".format(path))
+                elif e.errno in (errno.EXDEV, errno.EBUSY):
+                    not_moved.append(path)
+                else:
+                    raise
+        return trash_dir, not_moved
+
+    def _delete(self, paths, jobs):
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(lambda path: shutil.rmtree(path, ignore_errors=True), paths))
+
+    def _delete_in_background(self, path):
+        """
+        Delete the given directory from a detached process so the command returns immediately
+
+        :param path: directory to delete
+        :return: None
+        """
+        subprocess.Popen(
+            [sys.executable, "-c", "import shutil, sys; shutil.rmtree(sys.argv[1], ignore_errors=True)", path],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    def _hard_reset(self, jobs, wait):
+        """
+        Delete Odoo and every git addons directory
+
+        Directories are renamed into a trash directory at once, then deleted either in
+        background or, with `wait`, by parallel workers. Previous trash left by an
+        interrupted deletion is deleted as well.
+
+        :param jobs: maximum number of directories deleted concurrently
+        :param wait: delete before returning
+        :return: None
+        """
+        printing.info("Deleting remote addons...")
+        paths = [self._odoo.path]
+        for addons in self._addons:
+            if addons.type == ADDONS_TYPE_GIT and addons.path not in paths:
+                paths.append(addons.path)
+
+        trash_dir, not_moved = self._move_to_trash(paths)
+        repositories = [self._project.odoo_repository] + list(self._project.repositories)
+        clear_precompile_state(self._options, [repository.path for repository in repositories])
+        trash_root = os.path.dirname(trash_dir)
+        if wait:
+            trash_entries = [os.path.join(trash_root, entry) for entry in os.listdir(trash_root)]
+            self._delete(trash_entries + not_moved, jobs)
+            return
+        self._delete(not_moved, jobs)
+        for entry in os.listdir(trash_root):
+            self._delete_in_background(os.path.join(trash_root, entry))
+
+    def run(self, args):
+        self.load_config(args.file)
+        jobs = get_jobs(args)
+        if args.soft:
+            self._soft_reset(jobs)
+        else:
+            self._hard_reset(jobs, args.wait)
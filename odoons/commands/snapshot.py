@@ -0,0 +1,54 @@
+import os
+
+from .command import Command
+
+from odoons.utils import printing
+from odoons.utils.config import OPT_SNAPSHOT_DIR
+from odoons.utils.snapshot import export_snapshot, import_snapshot, get_snapshot_entries, get_snapshot_key
+from odoons.utils.state import get_state_dir
+
+SNAPSHOT_DIRECTORY = "snapshots"
+ACTION_EXPORT = "export"
+ACTION_IMPORT = "import"
+ACTION_KEY = "key"
+
+
+class Snapshot(Command):
+    def configure_parser(self, parser):
+        parser.add_argument(
+            "action",
+            choices=[ACTION_EXPORT, ACTION_IMPORT, ACTION_KEY],
+            help="pack checkouts into a snapshot, restore them from a snapshot or print the snapshot key",
+        )
+        parser.add_argument(
+            "-d",
+            "--directory",
+            help="Snapshots directory. Default: snapshot-directory option or <state directory>/snapshots",
+        )
+        parser.add_argument(
+            "--no-git",
+            action="store_true",
+            help="Snapshot working trees without their git directories (smallest archive, not updatable)",
+        )
+
+    def _get_directory(self, args):
+        directory = args.directory or self._options.get(OPT_SNAPSHOT_DIR)
+        if directory:
+            return os.path.abspath(os.path.expanduser(directory))
+        return os.path.join(get_state_dir(self._options), SNAPSHOT_DIRECTORY)
+
+    def run(self, args):
+        self.load_config(args.file)
+        include_git = not args.no_git
+        if args.action == ACTION_KEY:
+            print(get_snapshot_key(get_snapshot_entries(self._project), include_git))
+            return
+
+        directory = self._get_directory(args)
+        if args.action == ACTION_EXPORT:
+            path = export_snapshot(self._project, directory, include_git)
+            printing.success("Snapshot written to {}".format(path))
+            return
+        path = import_snapshot(self._project, directory, include_git, get_state_dir(self._options))
+        if path:
+            printing.success("Checkouts restored from {}".format(path))
@@ -0,0 +1,98 @@
+import os
+
+from .command import Command
+from . import get_command
+from .pull import add_pull_arguments
+
+from odoons.utils import gitstate, mirror, printing
+from odoons.utils.watcher import DEFAULT_INTERVAL, get_watcher
+
+
+class Watch(Command):
+    def configure_parser(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=DEFAULT_INTERVAL,
+            help="Polling interval in seconds when inotify is not available. Default: {}".format(DEFAULT_INTERVAL),
+        )
+        parser.add_argument(
+            "--polling",
+            action="store_true",
+            help="Poll for changes instead of using inotify",
+        )
+        add_pull_arguments(parser)
+
+    def _repositories(self):
+        repositories = [self._project.odoo_repository] + list(self._project.repositories)
+        return {repository.path: repository for repository in repositories}
+
+    def _watched_paths(self):
+        """
+        :return: tuple (watched files, watched directories)
+        """
+        config = get_command("config")()
+        config.load_config(self._project.file)
+        files = [self._project.file, config._get_template_path()]
+        directories = [os.path.abspath(path) for path in self._project.addons_paths]
+        return files, sorted(set(directories))
+
+    def _pull_changed_repositories(self, args):
+        """
+        Reload the YAML file and pull the repositories added or modified since the last load
+
+        :return: None
+        """
+        previous = self._repositories()
+        self.load_config(args.file)
+        changed = [repository for path, repository in self._repositories().items() if previous.get(path) != repository]
+        if not changed:
+            return
+        printing.info("Repositories changed: {}".format(", ".join(", ".join(r.names) for r in changed)))
+        get_command("pull")().run(args, paths=[repository.path for repository in changed])
+
+    def _apply(self, args, changed):
+        """
+        Apply the changes of the watched paths
+
+        Changed repositories are pulled when the YAML file changed. The configuration
+        file is then rendered again and only written when its content differs.
+
+        :param changed: set of changed paths
+        :return: None
+        """
+        printing.info("Changed: {}".format(", ".join(sorted(changed))))
+        if self._project.file in changed:
+            self._pull_changed_repositories(args)
+        get_command("config")().run(args)
+
+    def run(self, args):
+        """
+        Watch the YAML file, the configuration template and the addons paths and keep
+        the checkouts and the Odoo configuration file up to date
+
+        :return: None
+        """
+        self.load_config(args.file)
+        watcher = get_watcher(args.polling, args.interval)
+        # Paths are watched before applying anything: changes made meanwhile are reported by the next wait
+        watcher.watch(*self._watched_paths())
+        get_command("config")().run(args)
+        printing.info("Watching {} for changes (Ctrl+C to stop)...".format(self._project.file))
+        try:
+            while True:
+                changed = watcher.wait()
+                # Repositories may have been modified by hand and remotes may have moved while waiting
+                gitstate.clear()
+                mirror.clear()
+                try:
+                    self._apply(args, changed)
+                    # Addons paths may have changed along with the YAML file
+                    watcher.watch(*self._watched_paths())
+                except Exception as e:
+                    # Keep watching: the YAML file may be saved in an intermediate invalid state
+                    printing.error("{}: {}".format(e.__class__.__name__, e))
+        except KeyboardInterrupt:
+            printing.info("Stopped watching")
+        finally:
+            watcher.close()
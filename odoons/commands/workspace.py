@@ -0,0 +1,135 @@
+import glob
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .command import Command, add_jobs_argument, get_jobs
+
+from odoons.utils import printing, ssh
+from odoons.utils.config import OPT_SSH_MULTIPLEXING
+from odoons.utils.workspace import (
+    SharedCheckouts,
+    collect_references,
+    link_checkout,
+    load_projects,
+    update_project_lock,
+)
+
+DEFAULT_WORKSPACE_DIRECTORY = ".odoons-workspace"
+DEFAULT_PROJECT_FILE = "odoons.yml"
+
+
+def find_project_files(patterns):
+    """
+    :param patterns: odoons YAML files, project directories or glob patterns
+    :return: sorted list of odoons YAML files
+    """
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.expanduser(pattern)) or [pattern]:
+            if os.path.isdir(path):
+                path = os.path.join(path, DEFAULT_PROJECT_FILE)
+            if os.path.isfile(path):
+                files.add(os.path.abspath(path))
+            else:
+                printing.warning("No odoons file found for {}".format(pattern))
+    return sorted(files)
+
+
+class Workspace(Command):
+    def configure_parser(self, parser):
+        parser.add_argument(
+            "projects",
+            nargs="+",
+            help="odoons YAML files, project directories or glob patterns (e.g. '/srv/*/odoons.yml')",
+        )
+        parser.add_argument(
+            "-d",
+            "--directory",
+            default=DEFAULT_WORKSPACE_DIRECTORY,
+            help="Shared mirrors and checkouts directory. Default: {}".format(DEFAULT_WORKSPACE_DIRECTORY),
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Replace existing project checkouts without local changes at the shared commit",
+        )
+        add_jobs_argument(parser)
+
+    def _for_each_url(self, function, urls, jobs):
+        """
+        Run the given function for every URL using a bounded pool of workers
+
+        :return: OrderedDict() URL -> function result
+        """
+        def run(url):
+            with printing.buffered():
+                return function(url)
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return OrderedDict(zip(urls, executor.map(run, urls)))
+
+    def run(self, args):
+        files = find_project_files(args.projects)
+        if not files:
+            raise RuntimeError("No odoons project found")
+        jobs = get_jobs(args)
+        workspace = SharedCheckouts(args.directory)
+        projects = load_projects(files)
+        references = collect_references(projects)
+        if all(project.options.get(OPT_SSH_MULTIPLEXING, False) for project in projects):
+            ssh.enable()
+
+        printing.info("Fetching {} repositories for {} projects...".format(len(references), len(projects)))
+        returncodes = self._for_each_url(workspace.sync, list(references), jobs)
+        errors = [url for url, returncode in returncodes.items() if returncode != 0]
+
+        commits = OrderedDict()
+        resolved = OrderedDict((project.file, []) for project in projects)
+        for url, url_references in references.items():
+            if url in errors:
+                continue
+            for reference in url_references:
+                commit = workspace.resolve(url, reference.repository)
+                if not commit:
+                    printing.error(
+                        "{}: cannot resolve {} of {}".format(
+                            reference.project.file, reference.repository.commit or reference.repository.branch, url
+                        )
+                    )
+                    errors.append(url)
+                    continue
+                commits.setdefault(url, [])
+                if commit not in commits[url]:
+                    commits[url].append(commit)
+                resolved[reference.project.file].append((reference, commit))
+
+        printing.info("Checking out {} shared trees...".format(sum(len(values) for values in commits.values())))
+        failures = self._for_each_url(lambda url: workspace.checkout(url, commits[url]), list(commits), jobs)
+
+        linked = 0
+        for project in projects:
+            entries = []
+            for reference, commit in resolved[project.file]:
+                if commit in failures[reference.repository.url]:
+                    continue
+                target = workspace.checkout_path(reference.repository.url, commit)
+                if link_checkout(reference.repository.path, target, commit, args.replace):
+                    entries.append((reference.repository, reference.addons_names, commit))
+                    linked += 1
+            update_project_lock(project, entries)
+
+        printing.info(
+            "{} projects, {} repository references, {} URLs fetched once, {} shared checkouts".format(
+                len(projects),
+                sum(len(values) for values in references.values()),
+                len(references),
+                sum(len(values) for values in commits.values()),
+            )
+        )
+        failed = set(errors) | set(url for url, failed_commits in failures.items() if failed_commits)
+        if failed:
+            for url in failed:
+                printing.warning(url)
+            raise RuntimeError("{} repositories could not be shared".format(len(failed)))
+        printing.success("{} project checkouts linked to shared checkouts".format(linked))
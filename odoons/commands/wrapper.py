@@ -2,19 +2,23 @@ import os
 import sys
 import stat
 
-from .command import Command, commands_registry
+from .command import Command
+from . import get_command
 from odoons.utils.config import OPT_BIN_DIR, DEFAULT_OPTIONS
 from odoons.utils import printing
 
 
 class Wrapper(Command):
-    def _generate_start_odoo(self):
-        printing.info("Generating wrapper...")
+    def render(self, write=True):
+        """
+        Render the start_odoo wrapper without writing it
+
+        :param write: create the configuration directory referenced by the wrapper
+        :return: tuple (wrapper path, content)
+        """
         bin_dir = self._options.get(OPT_BIN_DIR, DEFAULT_OPTIONS[OPT_BIN_DIR])
-        if not os.path.exists(bin_dir):
-            os.makedirs(bin_dir, exist_ok=True)
         start_odoo_path = os.path.join(os.path.abspath(bin_dir), "start_odoo")
-        config_path = commands_registry["config"]()._get_config_path(self._options)
+        config_path = get_command("config")()._get_config_path(self._options, create=write)
         lines = [
             "#!{}".format(sys.executable),
             "import sys",
@@ -38,11 +42,19 @@ class Wrapper(Command):
             "except SystemExit as exc:",
             "    raise exc",
         ]
+        return start_odoo_path, os.linesep.join(lines)
+
+    def write(self, start_odoo_path, content):
+        os.makedirs(os.path.dirname(start_odoo_path), exist_ok=True)
         with open(start_odoo_path, "w") as f:
-            f.write(os.linesep.join(lines))
+            f.write(content)
         st = os.stat(start_odoo_path)
         os.chmod(start_odoo_path, st.st_mode | stat.S_IEXEC)
 
+    def _generate_start_odoo(self):
+        printing.info("Generating wrapper...")
+        self.write(*self.render())
+
     def run(self, args):
         self.load_config(args.file)
         self._generate_start_odoo()
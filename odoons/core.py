@@ -22,12 +22,15 @@ Options:
 
 """
 import argparse
+import sys
 
-from odoons.utils import printing
-from odoons.commands import commands_registry
+from odoons.utils import gitstate, mirror, printing, report
+from odoons.commands import COMMANDS, get_command
 
 
 DEFAULT_YAML_FILE = "odoons.yml"
+# Main parser options expecting a value, used to find the sub command name
+GLOBAL_VALUE_OPTIONS = ("-f", "--file", "--report")
 
 
 class Odoons:
@@ -42,11 +45,34 @@ class Odoons:
             default=DEFAULT_YAML_FILE,
             help="Path to odoons YAML file",
         )
+        self._parser.add_argument(
+            "--report",
+            metavar="PATH",
+            help="Write a timing report of every step and subprocess to the given JSON (or .jsonl) file",
+        )
         self._command_parser = self._parser.add_subparsers(title="command", dest="command", help="command to perform")
         self._commands = {}
-        for command in commands_registry.keys():
-            self._commands[command] = self._command_parser.add_parser(command)
-            commands_registry[command]().configure_parser(self._commands[command])
+        for command, command_help in COMMANDS.items():
+            self._commands[command] = self._command_parser.add_parser(command, help=command_help)
+
+    def _get_command_name(self, args):
+        """
+        Find the sub command name without parsing the whole command line
+
+        Only the sub command parser is configured so only its module is imported.
+
+        :param args: command line arguments
+        :return: sub command name or None
+        """
+        skip_value = False
+        for arg in args:
+            if skip_value:
+                skip_value = False
+            elif arg in GLOBAL_VALUE_OPTIONS:
+                skip_value = True
+            elif not arg.startswith("-"):
+                return arg
+        return None
 
     def run(self, args=None):
         """
@@ -57,12 +83,28 @@ class Odoons:
         """
         printing.info("====== Odoons ======")
 
-        if args:
-            self._args = self._parser.parse_args(args)
-        else:
-            self._args = self._parser.parse_args()
-
-        commands_registry[self._args.command]().run(self._args)
+        if not args:
+            args = sys.argv[1:]
+        command = self._get_command_name(args)
+        if command in COMMANDS:
+            get_command(command)().configure_parser(self._commands[command])
+
+        self._args = self._parser.parse_args(args)
+        if not self._args.command:
+            self._parser.print_help()
+            return
+        # Repositories may have changed since a previous run in the same process
+        gitstate.clear()
+        mirror.clear()
+        if not self._args.report:
+            get_command(self._args.command)().run(self._args)
+            return
+        report.enable()
+        try:
+            with report.step(self._args.command):
+                get_command(self._args.command)().run(self._args)
+        finally:
+            report.write(self._args.report)
 
 
 def main():
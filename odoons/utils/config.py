@@ -1,15 +1,30 @@
 import os
 from configparser import ConfigParser, ExtendedInterpolation
 
-from ruamel.yaml import YAML
-
 ADDONS_REQ_INSTALL_CONFIG = "install-requirements"
+ADDONS_PARTIAL_CONFIG = "partial"
+ADDONS_SPARSE_CONFIG = "sparse"
+
+ODOO_SPARSE_CORE_DIRECTORY = "odoo"
+ODOO_SPARSE_ADDONS_DIRECTORY = "addons"
 
 OPT_APPLY_REQS = "apply-requirements"
 OPT_INSTALL_ODOO = "install-odoo-command"
 OPT_CONF_TEMPLATE = "config-template"
 OPT_CONF_DIR = "config-directory"
 OPT_BIN_DIR = "bin-directory"
+OPT_MIRROR_DIR = "mirror-directory"
+OPT_MIRROR_MAX_AGE = "mirror-max-age"
+OPT_MERGE_REQS = "merge-requirements"
+OPT_STATE_DIR = "state-directory"
+OPT_TARGET_MODULES = "target-modules"
+OPT_FLATTEN_ADDONS = "flatten-addons"
+OPT_FLATTEN_DIR = "flatten-directory"
+OPT_GIT_BACKEND = "git-backend"
+OPT_SNAPSHOT_DIR = "snapshot-directory"
+OPT_SSH_MULTIPLEXING = "ssh-multiplexing"
+OPT_PRECOMPILE = "precompile"
+OPT_PRECOMPILE_INVALIDATION = "precompile-invalidation"
 
 DEFAULT_OPTIONS = {
     OPT_APPLY_REQS: True,
@@ -17,10 +32,13 @@ DEFAULT_OPTIONS = {
     OPT_CONF_TEMPLATE: "odoo.cfg.template",
     OPT_CONF_DIR: "etc",
     OPT_BIN_DIR: "bin",
+    OPT_STATE_DIR: ".odoons",
 }
 
 
 def load_odoons_config(path):
+    from ruamel.yaml import YAML
+
     yaml = YAML(typ="safe")
     with open(path, "r") as file:
         odoons_file = yaml.load(file)
@@ -37,7 +55,7 @@ def get_config_parser():
     return ConfigParser(interpolation=ExtendedInterpolation(), strict=False)
 
 
-def get_git_addons_path(conf):
+def get_git_addons_path(conf, base_dir=None):
     """
     Function computing addons path according to the given addons configuration dict()
 
@@ -48,9 +66,11 @@ def get_git_addons_path(conf):
 
 
     :param conf: addons configuration dict()
+    :param base_dir: directory relative paths are resolved from, current directory by default
     :return: string representation of addons path
     """
-    abspath = os.path.abspath(conf["path"])
+    path = os.path.join(base_dir or os.getcwd(), conf["path"])
+    abspath = os.path.abspath(path)
     if "standalone" in conf and conf["standalone"]:
-        abspath = os.path.abspath(os.path.join(conf["path"], conf["standalone"]))
+        abspath = os.path.abspath(os.path.join(path, conf["standalone"]))
     return abspath
@@ -1,85 +1,465 @@
 import os
 import subprocess
+import time
 
-from . import printing
+from . import gitstate, printing, report, ssh
+from .gitbackend import get_backend
+from .mirror import LocalSource, Mirror
+
+# Commands whose progress is requested when captured to report transferred bytes
+PROGRESS_COMMANDS = ("clone", "fetch")
+
+
+def git_output(command):
+    """
+    Run the given git command and return its standard output
+
+    :param command: command as list of arguments
+    :return: stripped standard output or None if the command failed
+    """
+    process = report.run(command, report.get_git_phase(command), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if process.returncode != 0:
+        return None
+    return process.stdout.decode(errors="replace").strip()
+
+
+def run_command(command):
+    """
+    Run the given git command
+
+    Output is streamed to the terminal unless the current thread output is
+    buffered (concurrent processing) in which case it is captured and appended
+    to the buffer once the command is done. The command is recorded in the run
+    report along with the transferred bytes when they can be read from the
+    captured output.
+
+    :param command: command as list of arguments
+    :return: command return code
+    """
+    printing.debug("Running command:" + str(command))
+    phase = report.get_git_phase(command)
+    start = time.time()
+    if printing.is_buffered():
+        if report.is_enabled() and phase in PROGRESS_COMMANDS:
+            index = command.index(phase) + 1
+            command = command[:index] + ["--progress"] + command[index:]
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        # Only keep the last state of progress lines
+        output = "\n".join(line.split("\r")[-1] for line in process.stdout.decode(errors="replace").split("\n"))
+        report.record_command(phase, command, process.returncode, start, report.parse_received_bytes(output))
+        if output.strip():
+            printing.output(output)
+        return process.returncode
+
+    printing.next_muted()
+    process = subprocess.run(command)
+    printing.reset()
+    report.record_command(phase, command, process.returncode, start)
+    return process.returncode
+
+
+def get_head(path):
+    """
+    :param path: repository directory
+    :return: current HEAD commit SHA or None if the directory is not a git repository
+    """
+    state = gitstate.get_state(path)
+    return state.head if state else None
 
 
 class Git:
-    def __init__(self, path, url, branch=None, commit=None):
+    def __init__(
+        self,
+        path,
+        url,
+        branch=None,
+        commit=None,
+        mirror_dir=None,
+        locked_commit=None,
+        partial=False,
+        sparse=None,
+        offline=False,
+        backend=None,
+        source=None,
+    ):
         self._path = path
         self._url = url
         self._branch = str(branch) if branch else None
         self._commit = str(commit) if commit else None
+        # Without mirror, a checkout of the same URL and revision (source) is used as local mirror
+        self._source = source
+        self._mirror = Mirror(mirror_dir, url) if mirror_dir else (LocalSource(source) if source else None)
+        self._locked_commit = str(locked_commit) if locked_commit else None
+        self._partial = partial
+        self._sparse = sparse
+        self._offline = offline
+        self._remote_head = None
+        self._backend = get_backend(backend, self._run, self._output, cli_only=partial or bool(sparse))
+
+    def _run(self, command):
+        """
+        Run the given git command (see `run_command`)
+
+        The cached repository state is invalidated as the command may have modified
+        the repository.
+
+        :param command: command as list of arguments
+        :return: command return code
+        """
+        try:
+            return run_command(command)
+        finally:
+            gitstate.invalidate(self._path)
+
+    def _output(self, command):
+        return git_output(command)
+
+    def state(self):
+        """
+        :return: cached RepositoryState or None if the directory is not a git repository
+        """
+        return gitstate.get_state(self._path)
+
+    def head(self):
+        """
+        :return: current HEAD commit SHA or None
+        """
+        state = self.state()
+        return state.head if state else None
+
+    def _offline_error(self, action):
+        printing.error("Offline mode: cannot {} {}".format(action, self._url))
+        return 1
+
+    def has_commit(self, commit):
+        """
+        Check whether the given commit is available locally without any network access
+
+        :param commit: commit SHA (or any revision)
+        :return: bool
+        """
+        return self._backend.has_commit(self._path, commit)
+
+    def is_at_commit(self, commit):
+        """
+        :param commit: full or abbreviated commit SHA
+        :return: whether HEAD is the given commit
+        """
+        head = self.head()
+        if not head or not commit:
+            return False
+        commit = commit.lower()
+        return head == commit or (len(commit) >= 7 and head.startswith(commit))
+
+    def remote_head(self):
+        """
+        Probe the remote branch commit through `git ls-remote` without fetching anything
+
+        The remote is only probed once per Git object. A repository with a local source
+        follows the HEAD of its source checkout.
+
+        :return: remote branch commit SHA or None
+        """
+        if self._source:
+            return get_head(self._source)
+        if self._offline:
+            return None
+        if self._remote_head is None:
+            ssh.connect(self._url)
+            output = self._output(["git", "ls-remote", self._url, "refs/heads/" + self._branch])
+            self._remote_head = output.split()[0] if output else None
+        return self._remote_head
+
+    def is_up_to_date(self):
+        """
+        Check whether a branch tracking repository can skip its update
+
+        The repository is considered up to date when the remote branch, the locked
+        commit and the local HEAD all point to the same commit.
+
+        :return: bool
+        """
+        if self.is_frozen() or not self._locked_commit:
+            return False
+        if self.head() != self._locked_commit:
+            return False
+        return self.remote_head() == self._locked_commit
+
+    def pending_update(self):
+        """
+        Describe what an update would change, without modifying anything
+
+        Branch tracking repositories are compared with their remote branch through
+        `git ls-remote` (unless offline). Local changes are only reported along with
+        an update discarding them: an up to date checkout is left untouched.
+
+        :return: reason string or None if the checkout is up to date
+        """
+        if self.is_shared():
+            return None
+        state = self.state()
+        if state is None:
+            return "clone {}".format(self._url)
+        reason = self._pending_reason(state)
+        if reason is None and self._sparse and not self._sparse_matches():
+            return "sparse directories changed"
+        if reason and self.is_dirty():
+            reason += ", discarding local changes"
+        return reason
+
+    def _pending_reason(self, state):
+        if state.remote_url != self._url:
+            return "remote URL changed from {}".format(state.remote_url)
+        if self.is_frozen():
+            return None if self.is_at_commit(self._commit) else "check out commit {}".format(self._commit)
+        if state.branch != self._branch:
+            return "switch from {} to branch {}".format(state.branch or state.head, self._branch)
+        if self._offline:
+            return None
+        remote_head = self.remote_head()
+        if remote_head and remote_head == state.head:
+            return None
+        return "remote branch {} moved".format(self._branch)
+
+    def is_dirty(self):
+        """
+        :return: whether tracked files have uncommitted changes (scans the working tree)
+        """
+        return bool(self._output(["git", "-C", self._path, "status", "--porcelain", "--untracked-files=no"]))
+
+    def fix_remote_url(self):
+        """
+        Point origin remote to the configured URL if it changed
+
+        :return: git return code
+        """
+        state = self.state()
+        if state is None or state.remote_url == self._url:
+            return 0
+        printing.info("Remote URL changed to {}".format(self._url))
+        action = "set-url" if state.remote_url else "add"
+        return self._run(["git", "-C", self._path, "remote", action, "origin", self._url])
 
     def is_git_directory(self):
-        command = ["git", "-C", self._path, "status"]
-        process = subprocess.call(command, stderr=subprocess.STDOUT, stdout=open(os.devnull, "w"))
-        return process == 0
+        return self.state() is not None
 
     def is_frozen(self):
         return bool(self._commit)
 
+    def is_shared(self):
+        """
+        :return: whether the checkout is a symbolic link to a shared workspace checkout
+        """
+        return os.path.islink(self._path)
+
     def clone(self):
         if self.is_git_directory():
             return self.update()
 
+        if self._mirror:
+            return self.clone_from_mirror()
+        if self._offline:
+            return self._offline_error("clone")
+
         command = ["git", "clone", "--depth", "1"]
 
         if not self.is_frozen():
             command += ["-b", self._branch]
+        if self._partial:
+            command += ["--filter=blob:none"]
+        if self._sparse:
+            command += ["--sparse"]
 
         command += [self._url, self._path]
-        printing.debug("Running command:" + str(command))
-        printing.next_muted()
-        sp = subprocess.Popen(command)
-        sp.wait()
-        printing.reset()
+        ssh.connect(self._url)
+        returncode = self._run(command)
+        if returncode == 0:
+            returncode = self.apply_sparse()
 
-        if not self.is_frozen() or sp.returncode != 0:
-            return sp.returncode
+        if not self.is_frozen() or returncode != 0:
+            return returncode
 
         printing.info("Repository is frozen to: {}".format(self._commit))
         return self.checkout()
 
+    def _sync_mirror(self):
+        """
+        Create or fetch the mirror, an existing mirror is used as is in offline mode
+
+        :return: git return code
+        """
+        if not self._offline:
+            return self._mirror.sync(self._run)
+        if not self._mirror.exists():
+            return self._offline_error("create mirror of")
+        return 0
+
+    def clone_from_mirror(self):
+        """
+        Clone the repository through a local clone of its mirror
+
+        Objects are hard linked from the mirror and origin remote is then pointed
+        back to the repository URL. Mirrors are full clones: partial clone has no
+        effect (hard linked objects do not use additional disk space anyway).
+
+        :return: git return code
+        """
+        if self._partial and isinstance(self._mirror, Mirror):
+            printing.warning("Partial clone has no effect with a mirror, cloning {} in full".format(self._url))
+        returncode = self._sync_mirror()
+        if returncode != 0:
+            return returncode
+
+        command = ["git", "clone"]
+        if self.is_frozen():
+            command += ["--no-checkout"]
+        else:
+            command += ["-b", self._branch]
+        if self._sparse:
+            command += ["--sparse"]
+        returncode = self._run(command + [self._mirror.path, self._path])
+        if returncode == 0:
+            returncode = self.apply_sparse()
+        if returncode != 0:
+            return returncode
+
+        self._run(["git", "-C", self._path, "remote", "set-url", "origin", self._url])
+        if not self.is_frozen():
+            return returncode
+
+        printing.info("Repository is frozen to: {}".format(self._commit))
+        return self.checkout_commit()
+
+    def apply_sparse(self):
+        """
+        Restrict the working tree to the configured sparse directories
+
+        Nothing is done when the repository is not sparse or when the sparse
+        checkout already matches the configured directories.
+
+        :return: git return code
+        """
+        if not self._sparse or self._sparse_matches():
+            return 0
+        return self._run(["git", "-C", self._path, "sparse-checkout", "set", "--cone"] + list(self._sparse))
+
+    def _sparse_matches(self):
+        current = self._output(["git", "-C", self._path, "sparse-checkout", "list"])
+        return current is not None and sorted(current.split()) == sorted(self._sparse)
+
+    def fetch(self):
+        """
+        Fetch origin remote branches
+
+        When a mirror is used, the mirror is fetched (once per run) and the branches
+        are then fetched locally from it.
+
+        :return: git return code
+        """
+        git_command = ["git", "-C", os.path.abspath(self._path)]
+        if not self._mirror:
+            if self._offline:
+                return self._offline_error("fetch")
+            ssh.connect(self._url)
+            return self._run(git_command + ["fetch", "origin"])
+        returncode = self._sync_mirror()
+        if returncode != 0:
+            return returncode
+        return self._run(git_command + ["fetch", self._mirror.path, "+refs/heads/*:refs/remotes/origin/*"])
+
     def update(self):
         if not self.is_git_directory():
             return self.clone()
 
-        path = os.path.abspath(self._path)
-        git_command = ["git", "-C", path]
-        printing.next_muted()
-        subprocess.run(git_command + ["fetch", "origin"])
-        if not self.is_frozen():
-            process = subprocess.run(git_command + ["reset", "--hard", "origin/" + self._branch])
-            printing.reset()
-            return process.returncode
+        returncode = self.fix_remote_url()
+        if returncode != 0:
+            return returncode
+
+        if self.is_frozen():
+            return self.update_frozen()
+
+        if self._offline:
+            printing.warning("Offline mode: keeping {} at its current commit".format(self._path))
+            return self.apply_sparse()
+
+        if self.is_up_to_date():
+            printing.info("Remote branch {} did not move, skipping update".format(self._branch))
+            return self.apply_sparse()
+
+        self.fetch()
+        self.apply_sparse()
+        return self._reset_hard("origin/" + self._branch)
 
+    def update_frozen(self):
+        """
+        Update a repository frozen to a commit
+
+        Nothing is fetched when HEAD already is the frozen commit or when the commit
+        is already available locally.
+
+        :return: git return code
+        """
+        if self.is_at_commit(self._commit):
+            printing.info("Repository already at commit {}, skipping update".format(self._commit))
+            return self.apply_sparse()
+        self.apply_sparse()
         return self.checkout()
 
     def checkout(self):
         if not self.is_git_directory():
             return self.clone()
-        fetch_return = self.fetch_commit()
-        if fetch_return != 0:
-            printing.error("Error fetching commit")
-            return fetch_return
+        if not self.has_commit(self._commit):
+            fetch_return = self.fetch_commit()
+            if fetch_return != 0:
+                printing.error("Error fetching commit")
+                return fetch_return
         checkout_return = self.checkout_commit()
         return checkout_return
 
+    def reset_clean(self):
+        """
+        Restore the working tree to HEAD and delete every untracked and ignored file
+
+        :return: git return code
+        """
+        git_command = ["git", "-C", self._path]
+        returncode = self._reset_hard("HEAD")
+        if returncode != 0:
+            return returncode
+        return self._run(git_command + ["clean", "-ffdx"])
+
+    def _reset_hard(self, revision):
+        """
+        Reset HEAD, index and working tree to the given revision through the git backend
+
+        :param revision: commit SHA or reference
+        :return: git return code
+        """
+        try:
+            return self._backend.reset_hard(self._path, revision)
+        finally:
+            gitstate.invalidate(self._path)
+
     def checkout_commit(self):
-        checkout_command = ["git", "-C", self._path, "reset", "--hard", self._commit]
-        printing.debug("Running command:" + str(checkout_command))
-        printing.next_muted()
-        sp = subprocess.Popen(checkout_command)
-        sp.wait()
-        printing.reset()
-        return sp.returncode
+        return self._reset_hard(self._commit)
 
     def fetch_commit(self):
-        checkout_command = ["git", "-C", self._path, "fetch", "--depth", "1", "origin", self._commit]
-        printing.debug("Running command:" + str(checkout_command))
-        printing.next_muted()
-        sp = subprocess.Popen(checkout_command)
-        sp.wait()
-        printing.reset()
-        return sp.returncode
+        """
+        Fetch the frozen commit
+
+        When a mirror is used, the mirror is fetched first (once per run) so a commit
+        pushed since its last fetch is found.
+
+        :return: git return code
+        """
+        if self._mirror:
+            returncode = self._sync_mirror()
+            if returncode != 0:
+                return returncode
+            checkout_command = ["git", "-C", self._path, "fetch", self._mirror.path, self._commit]
+        elif self._offline:
+            return self._offline_error("fetch")
+        else:
+            checkout_command = ["git", "-C", self._path, "fetch", "--depth", "1", "origin", self._commit]
+            ssh.connect(self._url)
+        return self._run(checkout_command)
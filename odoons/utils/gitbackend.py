@@ -0,0 +1,119 @@
+"""
+Git backends
+
+Local repository queries and checkouts go through a backend:
+
+- `cli` (default) runs the `git` command line
+- `pygit2` runs them in-process through libgit2 (optional dependency), sparing a
+  process spawn and a repository open per operation
+
+Network operations (clone, fetch, ls-remote) and partial or sparse repositories,
+which libgit2 does not support, always use the command line.
+"""
+import threading
+import time
+
+from . import printing, report
+
+BACKEND_CLI = "cli"
+BACKEND_PYGIT2 = "pygit2"
+BACKENDS = (BACKEND_CLI, BACKEND_PYGIT2)
+
+_fallback_warned = set()
+_warning_lock = threading.Lock()
+
+
+class CliBackend:
+    """
+    Backend running git commands through the given callables of a `Git` object
+    """
+
+    name = BACKEND_CLI
+
+    def __init__(self, run, output):
+        self._run = run
+        self._output = output
+
+    def has_commit(self, path, revision):
+        return self._output(["git", "-C", path, "cat-file", "-e", revision + "^{commit}"]) is not None
+
+    def reset_hard(self, path, revision):
+        return self._run(["git", "-C", path, "reset", "--hard", revision])
+
+
+class Pygit2Backend:
+    """
+    In-process backend based on pygit2
+
+    A backend is built for each `Git` object, which is only used by a single worker
+    thread at a time, and opens its repository once.
+    """
+
+    name = BACKEND_PYGIT2
+
+    def __init__(self, pygit2):
+        self._pygit2 = pygit2
+        self._repositories = {}
+
+    def _repository(self, path):
+        repository = self._repositories.get(path)
+        if repository is None:
+            repository = self._repositories[path] = self._pygit2.Repository(path)
+        return repository
+
+    def _resolve(self, path, revision):
+        try:
+            return self._repository(path).revparse_single(revision).peel(self._pygit2.Commit)
+        except (KeyError, ValueError, self._pygit2.GitError):
+            return None
+
+    def has_commit(self, path, revision):
+        return self._resolve(path, revision) is not None
+
+    def reset_hard(self, path, revision):
+        start = time.time()
+        command = [BACKEND_PYGIT2, "reset", "--hard", revision]
+        commit = self._resolve(path, revision)
+        if commit is None:
+            printing.error("Unknown revision {} in {}".format(revision, path))
+            report.record_command("checkout", command, 1, start)
+            return 1
+        try:
+            self._repository(path).reset(commit.id, self._pygit2.GIT_RESET_HARD)
+        except self._pygit2.GitError as e:
+            printing.error("Error checking out {} in {}: {}".format(revision, path, e))
+            report.record_command("checkout", command, 1, start)
+            return 1
+        printing.output("HEAD is now at {}".format(str(commit.id)[:7]))
+        report.record_command("checkout", command, 0, start)
+        return 0
+
+
+def _warn_fallback(name, reason):
+    with _warning_lock:
+        if name in _fallback_warned:
+            return
+        _fallback_warned.add(name)
+    printing.warning("Git backend {} unavailable ({}), using {}".format(name, reason, BACKEND_CLI))
+
+
+def get_backend(name, run, output, cli_only=False):
+    """
+    Build the requested git backend, falling back to the command line
+
+    :param name: backend name (`cli` or `pygit2`), None for the default one
+    :param run: callable running a git command and returning its return code
+    :param output: callable running a git command and returning its output or None
+    :param cli_only: whether the repository requires the command line (partial or sparse repository)
+    :return: CliBackend or Pygit2Backend
+    """
+    if not name or name == BACKEND_CLI or cli_only:
+        return CliBackend(run, output)
+    if name != BACKEND_PYGIT2:
+        raise RuntimeError("Unknown git backend {}: expected one of {}".format(name, ", ".join(BACKENDS)))
+    try:
+        import pygit2
+    except ImportError:
+        _warn_fallback(name, "pygit2 is not installed")
+        return CliBackend(run, output)
+    return Pygit2Backend(pygit2)
@@ -0,0 +1,187 @@
+"""
+Cheap git repository state probe
+
+Repository state (HEAD commit, current branch and origin URL) is read directly from
+the git directory files instead of running git commands, which would scan the
+whole working tree (`git status`) or at least spawn a process. States are cached
+for a single command run: they are invalidated by `Git` after every command
+modifying a repository, by commands moving or replacing checkouts, and cleared at
+the start of every command run (e.g. `watch` iterations).
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+
+RepositoryState = namedtuple("RepositoryState", ["path", "git_dir", "common_dir", "head", "branch", "remote_url"])
+
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+SYMBOLIC_REF_PREFIX = "ref: "
+BRANCH_REF_PREFIX = "refs/heads/"
+GIT_DIR_FILE_PREFIX = "gitdir:"
+MAX_SYMBOLIC_REF_DEPTH = 5
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def _read_file(path):
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def find_git_dir(path):
+    """
+    Find the git directory of the given working tree
+
+    The `.git` entry is either the git directory itself or, for worktrees and
+    submodules, a file pointing to it (`gitdir: <path>`).
+
+    :param path: working tree directory
+    :return: git directory absolute path or None if the directory is not a repository
+    """
+    dot_git = os.path.join(path, ".git")
+    if os.path.isdir(dot_git):
+        git_dir = dot_git
+    else:
+        content = _read_file(dot_git)
+        if not content or not content.startswith(GIT_DIR_FILE_PREFIX):
+            return None
+        git_dir = os.path.join(path, content[len(GIT_DIR_FILE_PREFIX) :].strip())
+    if not os.path.isfile(os.path.join(git_dir, "HEAD")):
+        return None
+    return os.path.abspath(git_dir)
+
+
+def get_common_dir(git_dir):
+    """
+    :param git_dir: git directory
+    :return: directory holding shared refs and config (differs from git_dir for worktrees)
+    """
+    common_dir = _read_file(os.path.join(git_dir, "commondir"))
+    if not common_dir:
+        return git_dir
+    return os.path.abspath(os.path.join(git_dir, common_dir))
+
+
+def _read_packed_ref(common_dir, ref):
+    content = _read_file(os.path.join(common_dir, "packed-refs"))
+    for line in (content or "").splitlines():
+        if line.startswith(("#", "^")):
+            continue
+        parts = line.split()
+        if len(parts) == 2 and parts[1] == ref:
+            return parts[0]
+    return None
+
+
+def resolve_ref(git_dir, common_dir, ref, depth=0):
+    """
+    Resolve the given reference to a commit SHA through loose refs and packed refs
+
+    :param git_dir: git directory (per worktree refs such as HEAD)
+    :param common_dir: common git directory (shared refs)
+    :param ref: reference name (HEAD, refs/heads/<branch>, ...)
+    :return: commit SHA or None (e.g. unborn branch)
+    """
+    if depth > MAX_SYMBOLIC_REF_DEPTH:
+        return None
+    for directory in (git_dir, common_dir):
+        content = _read_file(os.path.join(directory, ref))
+        if content is None:
+            continue
+        if content.startswith(SYMBOLIC_REF_PREFIX):
+            return resolve_ref(git_dir, common_dir, content[len(SYMBOLIC_REF_PREFIX) :].strip(), depth + 1)
+        return content if SHA_PATTERN.match(content) else None
+    return _read_packed_ref(common_dir, ref)
+
+
+def read_remote_url(common_dir, remote="origin"):
+    """
+    Read the URL of the given remote from the repository config file
+
+    :param common_dir: common git directory
+    :param remote: remote name
+    :return: remote URL or None
+    """
+    content = _read_file(os.path.join(common_dir, "config"))
+    section = '[remote "{}"]'.format(remote)
+    in_section = False
+    for line in (content or "").splitlines():
+        line = line.strip()
+        if line.startswith("["):
+            in_section = line == section
+            continue
+        if in_section and "=" in line:
+            key, value = line.split("=", 1)
+            if key.strip().lower() == "url":
+                return value.strip()
+    return None
+
+
+def probe(path):
+    """
+    Read the state of the given repository without running git
+
+    :param path: working tree directory
+    :return: RepositoryState or None if the directory is not a git repository
+    """
+    git_dir = find_git_dir(path)
+    if not git_dir:
+        return None
+    common_dir = get_common_dir(git_dir)
+    head = _read_file(os.path.join(git_dir, "HEAD")) or ""
+    branch = None
+    if head.startswith(SYMBOLIC_REF_PREFIX):
+        ref = head[len(SYMBOLIC_REF_PREFIX) :].strip()
+        if ref.startswith(BRANCH_REF_PREFIX):
+            branch = ref[len(BRANCH_REF_PREFIX) :]
+    return RepositoryState(
+        path=path,
+        git_dir=git_dir,
+        common_dir=common_dir,
+        head=resolve_ref(git_dir, common_dir, "HEAD"),
+        branch=branch,
+        remote_url=read_remote_url(common_dir),
+    )
+
+
+def get_state(path):
+    """
+    Get the cached state of the given repository, probing it on first use
+
+    :param path: working tree directory
+    :return: RepositoryState or None if the directory is not a git repository
+    """
+    path = os.path.abspath(path)
+    with _states_lock:
+        if path in _states:
+            return _states[path]
+    state = probe(path)
+    with _states_lock:
+        _states[path] = state
+    return state
+
+
+def invalidate(path):
+    """
+    Drop the cached state of the given repository after it was modified
+
+    :param path: working tree directory
+    :return: None
+    """
+    with _states_lock:
+        _states.pop(os.path.abspath(path), None)
+
+
+def clear():
+    """
+    Drop every cached state, repositories may have been modified outside odoons
+
+    :return: None
+    """
+    with _states_lock:
+        _states.clear()
@@ -0,0 +1,48 @@
+"""
+Odoons lock file handling
+
+The lock file records the resolved commit of Odoo and of every git addons entry so
+`update` can skip repositories whose remote branch did not move and `init --locked`
+can reproduce the exact same tree.
+"""
+import os
+
+LOCK_FILE = "odoons.lock"
+ODOO_LOCK_KEY = "odoo"
+
+
+def get_lock_path(config_path):
+    return os.path.join(os.path.dirname(os.path.abspath(config_path)), LOCK_FILE)
+
+
+def load_lock(path):
+    """
+    Load the given lock file
+
+    :param path: lock file path
+    :return: dict with `odoo` and `addons` entries or None if the lock file does not exist
+    """
+    if not os.path.isfile(path):
+        return None
+    from ruamel.yaml import YAML
+
+    yaml = YAML(typ="safe")
+    with open(path, "r") as file:
+        data = yaml.load(file) or {}
+    return {
+        ODOO_LOCK_KEY: data.get(ODOO_LOCK_KEY) or {},
+        "addons": data.get("addons") or {},
+    }
+
+
+def dump_lock(path, data):
+    from ruamel.yaml import YAML
+
+    yaml = YAML(typ="safe")
+    yaml.default_flow_style = False
+    with open(path, "w") as outfile:
+        yaml.dump(data, outfile)
+
+
+def lock_entry(url, branch, commit):
+    return {"url": url, "branch": str(branch) if branch else None, "commit": commit}
@@ -0,0 +1,126 @@
+"""
+Shared local mirror cache of git repositories
+
+A mirror cache directory keeps one bare mirror per repository URL. Checkouts are made
+through local clones of these mirrors (objects are hard linked, no network traffic)
+and updates fetch each mirror once per command run before fanning out to every checkout.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+from . import printing, ssh
+
+LAST_USE_FILE = "odoons-last-use"
+
+_locks = {}
+_locks_lock = threading.Lock()
+_synced = set()
+
+
+def _get_lock(path):
+    with _locks_lock:
+        return _locks.setdefault(path, threading.Lock())
+
+
+class Mirror:
+    def __init__(self, cache_dir, url):
+        self._cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self._url = url
+        self.path = os.path.join(self._cache_dir, self._get_dirname(url))
+
+    @staticmethod
+    def _get_dirname(url):
+        digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+        name = re.sub(r"\.git$", "", url.rstrip("/").split("/")[-1].split(":")[-1])
+        return "{}-{}.git".format(re.sub(r"[^\w.-]", "_", name), digest)
+
+    def exists(self):
+        return os.path.isfile(os.path.join(self.path, "HEAD"))
+
+    def touch(self):
+        with open(os.path.join(self.path, LAST_USE_FILE), "w") as f:
+            f.write(str(time.time()))
+
+    def sync(self, run):
+        """
+        Create or fetch the mirror once per process
+
+        Concurrent callers for the same URL wait for the first one to finish.
+
+        :param run: callable running a git command and returning its return code
+        :return: git return code
+        """
+        with _get_lock(self.path):
+            if self.path in _synced:
+                return 0
+            ssh.connect(self._url)
+            if self.exists():
+                printing.info("Fetching mirror {}...".format(self.path))
+                returncode = run(["git", "-C", self.path, "fetch", "--prune", "origin"])
+            else:
+                printing.info("Creating mirror {}...".format(self.path))
+                os.makedirs(self._cache_dir, exist_ok=True)
+                returncode = run(["git", "clone", "--mirror", self._url, self.path])
+            if returncode == 0:
+                _synced.add(self.path)
+                self.touch()
+            return returncode
+
+
+def clear():
+    """
+    Forget which mirrors were synced so the next run fetches them again
+
+    :return: None
+    """
+    with _locks_lock:
+        _synced.clear()
+
+
+class LocalSource:
+    """
+    Another checkout of the same repository and revision used in place of a mirror
+
+    The source checkout is updated first in the run, so it is never fetched here.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, ".git"))
+
+    def touch(self):
+        pass
+
+    def sync(self, run):
+        return 0
+
+
+def evict_mirrors(cache_dir, max_age):
+    """
+    Delete mirrors which have not been used for more than `max_age` days
+
+    Checkouts are hard linked local clones, deleting a mirror never breaks them.
+
+    :param cache_dir: mirror cache directory
+    :param max_age: maximum age in days since last use
+    :return: None
+    """
+    cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+    if not max_age or not os.path.isdir(cache_dir):
+        return
+    limit = time.time() - float(max_age) * 86400
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if path in _synced or not os.path.isfile(os.path.join(path, "HEAD")):
+            continue
+        marker = os.path.join(path, LAST_USE_FILE)
+        last_use = os.path.getmtime(marker if os.path.exists(marker) else path)
+        if last_use < limit:
+            printing.info("Evicting unused mirror {}...".format(path))
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,276 @@
+"""
+Odoo modules index
+
+Every addons path is scanned for Odoo modules and their manifests are parsed (safely,
+through `ast.literal_eval`). The index is persisted in the state directory and each
+addons path is only rescanned when the HEAD of its repositories changed (or its
+modification times for local addons).
+"""
+import ast
+import os
+from collections import OrderedDict
+
+from . import printing
+from .git import get_head
+from .project import ADDONS_TYPE_GIT
+from .state import load_state, dump_state
+
+MANIFEST_FILES = ("__manifest__.py", "__openerp__.py")
+MODULES_STATE = "modules"
+# Modules always loaded by Odoo (server wide modules)
+IMPLICIT_MODULES = ("base", "web")
+
+
+def read_manifest(module_path):
+    """
+    Safely parse the manifest of the given module directory
+
+    :param module_path: module directory
+    :return: manifest dict() or None if the directory is not a module
+    """
+    for manifest_file in MANIFEST_FILES:
+        manifest_path = os.path.join(module_path, manifest_file)
+        if os.path.isfile(manifest_path):
+            break
+    else:
+        return None
+    try:
+        with open(manifest_path, "r") as file:
+            manifest = ast.literal_eval(file.read())
+    except (SyntaxError, ValueError, OSError) as e:
+        printing.warning("Invalid manifest {}: {}".format(manifest_path, e))
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def _iter_module_dirs(path):
+    try:
+        entries = sorted(os.listdir(path))
+    except OSError:
+        return
+    for entry in entries:
+        module_path = os.path.join(path, entry)
+        if os.path.isdir(module_path):
+            yield entry, module_path
+
+
+def scan_addons_path(path):
+    """
+    Scan the given addons path for Odoo modules
+
+    :param path: addons path
+    :return: dict() module name -> module info dict()
+    """
+    modules = OrderedDict()
+    for name, module_path in _iter_module_dirs(path):
+        manifest = read_manifest(module_path)
+        if manifest is None:
+            continue
+        modules[name] = {
+            "path": module_path,
+            "version": str(manifest.get("version", "")),
+            "depends": [str(depend) for depend in manifest.get("depends", [])],
+            "external_dependencies": manifest.get("external_dependencies", {}),
+            "installable": bool(manifest.get("installable", True)),
+        }
+    return modules
+
+
+def get_addons_path_sources(project):
+    """
+    Map every addons path to the git repositories providing its content
+
+    Standalone entries share an addons path containing one repository per module.
+
+    :param project: Project
+    :return: OrderedDict() addons path -> list of repository directories (empty for local addons)
+    """
+    sources = OrderedDict((path, []) for path in project.addons_paths)
+    for path in project.addons_paths[:2]:
+        sources[path].append(project.odoo.path)
+    for record in project.addons:
+        if record.type == ADDONS_TYPE_GIT and record.repository_path not in sources[record.path]:
+            sources[record.path].append(record.repository_path)
+    return sources
+
+
+def get_addons_path_key(path, repositories):
+    """
+    Compute the cache key of an addons path
+
+    Git addons paths are keyed by the HEAD of their repositories. Local addons paths
+    are keyed by the modification times of the directory and of the module manifests.
+
+    :param path: addons path
+    :param repositories: repository directories providing the addons path
+    :return: string key
+    """
+    if repositories:
+        return "git:" + ",".join(str(get_head(repository)) for repository in repositories)
+    mtimes = []
+    for _, module_path in _iter_module_dirs(path):
+        for manifest_file in MANIFEST_FILES:
+            manifest_path = os.path.join(module_path, manifest_file)
+            if os.path.isfile(manifest_path):
+                mtimes.append(os.stat(manifest_path).st_mtime_ns)
+    directory_mtime = os.stat(path).st_mtime_ns if os.path.isdir(path) else 0
+    return "mtime:{}:{}".format(directory_mtime, max(mtimes) if mtimes else 0)
+
+
+class ModuleIndex:
+    """
+    Index of the Odoo modules available in the project addons paths
+
+    Addons paths order is kept: when a module is provided by several paths, the
+    first one wins as it does in Odoo.
+    """
+
+    def __init__(self, project):
+        self._project = project
+        self._paths = OrderedDict()
+
+    def refresh(self, force=False, write=True):
+        """
+        Load the persisted index and rescan addons paths whose key changed
+
+        :param force: rescan every addons path
+        :param write: persist the refreshed index
+        :return: list of rescanned addons paths
+        """
+        state = load_state(self._project.options, MODULES_STATE)
+        cached_paths = state.get("paths", {})
+        rescanned = []
+        for path, repositories in get_addons_path_sources(self._project).items():
+            key = get_addons_path_key(path, repositories)
+            cached = cached_paths.get(path)
+            if not force and cached and cached.get("key") == key:
+                self._paths[path] = cached
+                continue
+            self._paths[path] = {"key": key, "modules": scan_addons_path(path)}
+            rescanned.append(path)
+        if write and (rescanned or set(cached_paths) != set(self._paths)):
+            dump_state(self._project.options, MODULES_STATE, {"paths": self._paths})
+        return rescanned
+
+    def path_modules(self, path):
+        return self._paths.get(path, {}).get("modules", {})
+
+    def modules(self):
+        """
+        :return: OrderedDict() module name -> (addons path, module info) of the effective modules
+        """
+        modules = OrderedDict()
+        for path, data in self._paths.items():
+            for name, info in data["modules"].items():
+                modules.setdefault(name, (path, info))
+        return modules
+
+    def duplicates(self):
+        """
+        :return: OrderedDict() module name -> list of addons paths providing it, for modules provided twice or more
+        """
+        providers = OrderedDict()
+        for path, data in self._paths.items():
+            for name in data["modules"]:
+                providers.setdefault(name, []).append(path)
+        return OrderedDict((name, paths) for name, paths in providers.items() if len(paths) > 1)
+
+    def dependency_tree(self, name):
+        """
+        Build the dependency tree of the given module
+
+        Already visited modules are not expanded again.
+
+        :param name: module name
+        :return: list of (depth, module name, found) tuples in display order
+        """
+        modules = self.modules()
+        lines = []
+        visited = set()
+
+        def visit(module, depth):
+            found = module in modules
+            lines.append((depth, module, found))
+            if not found or module in visited:
+                return
+            visited.add(module)
+            for depend in modules[module][1]["depends"]:
+                visit(depend, depth + 1)
+
+        visit(name, 0)
+        return lines
+
+    def dependency_closure(self, targets):
+        """
+        Compute the transitive `depends` closure of the given modules
+
+        :param targets: module names
+        :return: tuple (set of module names, list of (missing module, required by) tuples)
+        """
+        modules = self.modules()
+        closure = set()
+        missing = []
+        stack = [(target, None) for target in reversed(list(IMPLICIT_MODULES) + list(targets))]
+        while stack:
+            name, required_by = stack.pop()
+            if name in closure:
+                continue
+            if name not in modules:
+                if name not in (module for module, _ in missing):
+                    missing.append((name, required_by))
+                continue
+            closure.add(name)
+            stack.extend((depend, name) for depend in reversed(modules[name][1]["depends"]))
+        return closure, missing
+
+    def pruned_addons_paths(self, closure):
+        """
+        Compute the addons paths providing the given modules
+
+        Addons paths order is kept and the Odoo framework addons path is always kept.
+
+        :param closure: module names, usually a dependency closure
+        :return: list of addons paths
+        """
+        providers = set(path for name, (path, _) in self.modules().items() if name in closure)
+        return [path for index, path in enumerate(self._paths) if index == 0 or path in providers]
+
+    def flatten(self, directory, closure=None):
+        """
+        Maintain a directory of per-module symbolic links to the effective modules
+
+        Modules of the Odoo framework addons path are not linked as this path is always
+        kept. On name collisions, the first addons path wins as it does in Odoo. Links
+        which are already correct are never rewritten and stale links are removed.
+
+        :param directory: flattened addons directory
+        :param closure: optional module names to link (all modules by default)
+        :return: tuple (number of created or updated links, number of removed links)
+        """
+        framework_path = next(iter(self._paths), None)
+        for name, paths in self.duplicates().items():
+            printing.warning("Module {} provided by several addons paths, using {}".format(name, paths[0]))
+
+        expected = {}
+        for name, (path, info) in self.modules().items():
+            if path != framework_path and (closure is None or name in closure):
+                expected[name] = info["path"]
+
+        os.makedirs(directory, exist_ok=True)
+        updated = removed = 0
+        for entry in os.listdir(directory):
+            link_path = os.path.join(directory, entry)
+            if entry not in expected and os.path.islink(link_path):
+                os.unlink(link_path)
+                removed += 1
+        for name, module_path in expected.items():
+            link_path = os.path.join(directory, name)
+            if os.path.islink(link_path) and os.readlink(link_path) == module_path:
+                continue
+            tmp_path = link_path + ".odoons-tmp"
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+            os.symlink(module_path, tmp_path)
+            os.replace(tmp_path, link_path)
+            updated += 1
+        return updated, removed
@@ -0,0 +1,146 @@
+"""
+Bytecode precompilation
+
+Python files of Odoo and of every addons path are compiled by a pool of processes so
+the first Odoo start does not have to (e.g. on read-only container file systems).
+Directories are only compiled again when their key changed since their last
+successful compilation with the same invalidation mode: the HEAD of git
+repositories, the modification times of the Python files of local addons. Hash based invalidation
+modes keep the bytecode valid whatever the file modification times (e.g. in images).
+"""
+import compileall
+import functools
+import os
+import py_compile
+from concurrent.futures import ProcessPoolExecutor
+
+from . import printing
+from .git import get_head
+from .project import ADDONS_TYPE_LOCAL
+from .state import dump_state, load_state
+
+PRECOMPILE_STATE = "precompile"
+INVALIDATION_MODES = ("timestamp", "checked-hash", "unchecked-hash")
+DEFAULT_INVALIDATION_MODE = "checked-hash"
+EXCLUDED_DIRECTORIES = (".git", "__pycache__", "node_modules")
+CHUNK_SIZE = 64
+
+
+def get_invalidation_mode(name):
+    """
+    :param name: invalidation mode name (timestamp, checked-hash or unchecked-hash)
+    :return: py_compile.PycInvalidationMode or None when not supported (Python < 3.7)
+    """
+    if name not in INVALIDATION_MODES:
+        raise RuntimeError(
+            "Unknown precompile invalidation mode {}: expected one of {}".format(name, ", ".join(INVALIDATION_MODES))
+        )
+    if not hasattr(py_compile, "PycInvalidationMode"):
+        printing.warning("Python < 3.7 only supports timestamp based bytecode invalidation")
+        return None
+    return getattr(py_compile.PycInvalidationMode, name.upper().replace("-", "_"))
+
+
+def _python_files(path):
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if name not in EXCLUDED_DIRECTORIES]
+        for name in files:
+            if name.endswith(".py"):
+                yield os.path.join(root, name)
+
+
+def _local_key(path):
+    """
+    :param path: local addons directory
+    :return: key changing whenever a Python file is added, removed or modified
+    """
+    mtimes = []
+    for file_path in _python_files(path):
+        try:
+            mtimes.append(os.stat(file_path).st_mtime_ns)
+        except OSError:
+            continue
+    return "mtime:{}:{}".format(max(mtimes) if mtimes else 0, len(mtimes))
+
+
+def get_precompile_targets(project):
+    """
+    :param project: Project
+    :return: list of (name, path, key) of the directories to compile
+    """
+    targets = []
+    for repository in [project.odoo_repository] + list(project.repositories):
+        head = get_head(repository.path)
+        targets.append((", ".join(repository.names), os.path.abspath(repository.path), head and "git:" + head))
+    for record in project.addons:
+        if record.type == ADDONS_TYPE_LOCAL and os.path.isdir(record.path):
+            targets.append((record.name, os.path.abspath(record.path), _local_key(record.path)))
+    return targets
+
+
+def get_pending_targets(options, project, mode):
+    """
+    List the directories whose bytecode is outdated
+
+    :param options: odoons options
+    :param project: Project
+    :param mode: invalidation mode name
+    :return: list of (name, path, key)
+    """
+    state = load_state(options, PRECOMPILE_STATE)
+    return [
+        (name, path, key)
+        for name, path, key in get_precompile_targets(project)
+        if key and os.path.isdir(path) and state.get(path) != [key, mode]
+    ]
+
+
+def clear_precompile_state(options, paths):
+    """
+    Forget the compilation of the given directories (e.g. after their bytecode was deleted)
+
+    :param options: odoons options
+    :param paths: directories
+    :return: None
+    """
+    state = load_state(options, PRECOMPILE_STATE)
+    paths = [os.path.abspath(path) for path in paths]
+    if any(path in state for path in paths):
+        dump_state(options, PRECOMPILE_STATE, {k: v for k, v in state.items() if k not in paths})
+
+
+def precompile(options, project, mode=DEFAULT_INVALIDATION_MODE, jobs=None):
+    """
+    Compile the Python files of the directories whose bytecode is outdated
+
+    :param options: odoons options
+    :param project: Project
+    :param mode: invalidation mode name
+    :param jobs: number of compiling processes, CPU count by default
+    :return: number of files which could not be compiled
+    """
+    invalidation_mode = get_invalidation_mode(mode)
+    targets = get_pending_targets(options, project, mode)
+    if not targets:
+        printing.info("Bytecode is up to date")
+        return 0
+
+    printing.info("Precompiling {}...".format(", ".join(name for name, _, _ in targets)))
+    compile_file = functools.partial(compileall.compile_file, quiet=2)
+    if invalidation_mode is not None:
+        compile_file = functools.partial(compile_file, invalidation_mode=invalidation_mode)
+    state = load_state(options, PRECOMPILE_STATE)
+    failures = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for name, path, key in targets:
+            files = list(_python_files(path))
+            results = list(executor.map(compile_file, files, chunksize=CHUNK_SIZE))
+            errors = results.count(False)
+            if errors:
+                # Odoo ships a few files which are not valid Python 3 (e.g. tests data)
+                printing.warning("{}: {} files could not be compiled".format(name, errors))
+                failures += errors
+            state[path] = [key, mode]
+            printing.debug("{}: {} files compiled".format(name, len(files)))
+    dump_state(options, PRECOMPILE_STATE, state)
+    return failures
@@ -1,3 +1,8 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
 class Colors:
     """
     sources: https://www.geeksforgeeks.org/print-colors-python-terminal/
@@ -47,29 +52,67 @@ class Colors:
         lightgrey = "\033[47m"
 
 
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _write(text):
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None:
+        buffer.append(text)
+        return
+    with _lock:
+        print(text)
+
+
+def is_buffered():
+    return getattr(_local, "buffer", None) is not None
+
+
+@contextmanager
+def buffered():
+    """
+    Buffer every message printed by the current thread and flush them at once on exit
+
+    Used when several repositories are processed concurrently so each one output
+    stays grouped and readable.
+    """
+    _local.buffer = []
+    try:
+        yield
+    finally:
+        lines, _local.buffer = _local.buffer, None
+        with _lock:
+            print(os.linesep.join(lines))
+
+
+def output(text):
+    _write("{}{}{}".format(Colors.fg.lightgrey, text.rstrip(), Colors.reset))
+
+
 def next_muted():
-    print(Colors.fg.lightgrey)
+    _write(Colors.fg.lightgrey)
 
 
 def reset():
-    print(Colors.reset)
+    _write(Colors.reset)
 
 
 def info(msg):
-    print("{}{}{}".format(Colors.bold, msg, Colors.reset))
+    _write("{}{}{}".format(Colors.bold, msg, Colors.reset))
 
 
 def success(msg):
-    print("{}{}{}".format(Colors.bold, msg, Colors.reset))
+    _write("{}{}{}".format(Colors.bold, msg, Colors.reset))
 
 
 def warning(msg):
-    print("{}{}{}".format(Colors.fg.orange, msg, Colors.reset))
+    _write("{}{}{}".format(Colors.fg.orange, msg, Colors.reset))
 
 
 def error(msg):
-    print("{}{}{}".format(Colors.fg.red, msg, Colors.reset))
+    _write("{}{}{}".format(Colors.fg.red, msg, Colors.reset))
 
 
 def debug(msg):
-    print("{}{}{}".format(Colors.fg.purple, msg, Colors.reset))
+    _write("{}{}{}".format(Colors.fg.purple, msg, Colors.reset))
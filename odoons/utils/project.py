@@ -0,0 +1,284 @@
+"""
+Odoons project model
+
+The odoons YAML file is parsed, validated and normalized once per process into an
+immutable project model shared by every command (and every worker thread).
+"""
+import json
+import os
+import threading
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+
+from . import printing
+from .config import (
+    ADDONS_REQ_INSTALL_CONFIG,
+    ADDONS_PARTIAL_CONFIG,
+    ADDONS_SPARSE_CONFIG,
+    DEFAULT_OPTIONS,
+    ODOO_SPARSE_CORE_DIRECTORY,
+    ODOO_SPARSE_ADDONS_DIRECTORY,
+    OPT_STATE_DIR,
+    get_git_addons_path,
+    load_odoons_config,
+)
+
+DEFAULT_ODOO_URL = "https://github.com/odoo/odoo"
+ODOO_NAME = "odoo"
+
+ADDONS_TYPE_GIT = "git"
+ADDONS_TYPE_LOCAL = "local"
+ADDONS_TYPES = (ADDONS_TYPE_GIT, ADDONS_TYPE_LOCAL)
+
+OdooRecord = namedtuple("OdooRecord", ["version", "url", "path", "commit", "options", "partial", "sparse"])
+
+AddonsRecord = namedtuple(
+    "AddonsRecord",
+    [
+        "name",
+        "type",
+        "path",
+        "url",
+        "branch",
+        "commit",
+        "standalone",
+        "install_requirements",
+        "partial",
+        "sparse",
+        "repository_path",
+    ],
+)
+
+# Physical git repository shared by one or several entries
+Repository = namedtuple("Repository", ["names", "path", "url", "branch", "commit", "partial", "sparse"])
+
+Project = namedtuple(
+    "Project",
+    ["file", "odoo", "options", "addons", "odoo_repository", "repositories", "conflicts", "addons_paths"],
+)
+
+CONFIG_CACHE_FILE = "config-cache.json"
+
+_projects = {}
+_projects_lock = threading.Lock()
+
+
+def _str_or_none(value):
+    return str(value) if value is not None and value != "" else None
+
+
+def _modules(value):
+    return tuple(sorted(set(str(module) for module in value or [])))
+
+
+def _parse_odoo(conf, base_dir):
+    if not isinstance(conf, dict) or not conf.get("version") or not conf.get("path"):
+        raise RuntimeError("Invalid odoo section: version and path are required")
+    return OdooRecord(
+        version=str(conf["version"]),
+        url=conf.get("url", DEFAULT_ODOO_URL),
+        path=os.path.abspath(os.path.join(base_dir, conf["path"])),
+        commit=_str_or_none(conf.get("commit")),
+        options=MappingProxyType(dict(conf.get("options") or {})),
+        partial=bool(conf.get(ADDONS_PARTIAL_CONFIG, False)),
+        sparse=_modules(conf.get(ADDONS_SPARSE_CONFIG)),
+    )
+
+
+def _parse_addons(name, conf, base_dir):
+    if not isinstance(conf, dict) or not conf.get("path"):
+        raise RuntimeError("Invalid addons {}: path is required".format(name))
+    addons_type = conf.get("type")
+    if addons_type not in ADDONS_TYPES:
+        raise RuntimeError("Invalid addons {}: unknown type {}".format(name, addons_type))
+    if addons_type == ADDONS_TYPE_GIT:
+        if not conf.get("url"):
+            raise RuntimeError("Invalid addons {}: url is required".format(name))
+        if not conf.get("branch") and not conf.get("commit"):
+            raise RuntimeError("Invalid addons {}: branch or commit is required".format(name))
+    return AddonsRecord(
+        name=name,
+        type=addons_type,
+        path=os.path.abspath(os.path.join(base_dir, conf["path"])),
+        url=conf.get("url"),
+        branch=_str_or_none(conf.get("branch")),
+        commit=_str_or_none(conf.get("commit")),
+        standalone=_str_or_none(conf.get("standalone")),
+        install_requirements=bool(conf.get(ADDONS_REQ_INSTALL_CONFIG, True)),
+        partial=bool(conf.get(ADDONS_PARTIAL_CONFIG, False)),
+        sparse=_modules(conf.get(ADDONS_SPARSE_CONFIG)),
+        repository_path=get_git_addons_path(conf, base_dir),
+    )
+
+
+def get_sparse_directories(records, odoo=False):
+    """
+    Compute the sparse checkout directories of a repository
+
+    The `sparse` entry of a configuration holds the list of modules to check out.
+    For Odoo core, modules are looked up in the `addons` directory and the `odoo`
+    directory (framework and base module) is always checked out.
+
+    :param records: records sharing the same repository
+    :param odoo: whether the repository is Odoo core
+    :return: sorted tuple of directories or None if the repository is not sparse
+    """
+    modules = set()
+    for record in records:
+        modules.update(record.sparse)
+    if not modules:
+        return None
+    if not odoo:
+        return tuple(sorted(modules))
+    directories = [os.path.join(ODOO_SPARSE_ADDONS_DIRECTORY, module) for module in modules]
+    return tuple(sorted(directories + [ODOO_SPARSE_CORE_DIRECTORY]))
+
+
+def _group_repositories(addons):
+    """
+    Group git addons entries by physical repository
+
+    Several entries using the same URL, path and revision share a single repository
+    which only has to be fetched once. Entries using an already used path with a
+    different URL or revision are reported as conflicts.
+
+    :param addons: tuple of AddonsRecord
+    :return: tuple (repositories, conflicts) where conflicts is a tuple of (name, conflicting name)
+    """
+    groups = OrderedDict()
+    conflicts = []
+    for record in addons:
+        if record.type != ADDONS_TYPE_GIT:
+            continue
+        key = (record.url, record.branch, record.commit)
+        if record.repository_path not in groups:
+            groups[record.repository_path] = (key, [record])
+            continue
+        group_key, records = groups[record.repository_path]
+        if group_key == key:
+            records.append(record)
+        else:
+            conflicts.append((record.name, records[0].name))
+
+    repositories = tuple(
+        Repository(
+            names=tuple(record.name for record in records),
+            path=path,
+            url=records[0].url,
+            branch=records[0].branch,
+            commit=records[0].commit,
+            partial=any(record.partial for record in records),
+            sparse=get_sparse_directories(records),
+        )
+        for path, (_, records) in groups.items()
+    )
+    return repositories, tuple(conflicts)
+
+
+def parse_project(path, data, base_dir=None):
+    """
+    Build the project model from the given raw configuration
+
+    :param path: odoons YAML file path
+    :param data: raw configuration dict() as returned by `load_odoons_config`
+    :param base_dir: directory relative paths are resolved from, current directory by default
+    :return: Project
+    """
+    base_dir = base_dir or os.getcwd()
+    odoo = _parse_odoo(data["odoo"], base_dir)
+    options = dict(DEFAULT_OPTIONS)
+    options.update(data.get("options") or {})
+    addons = tuple(_parse_addons(name, conf, base_dir) for name, conf in (data.get("addons") or {}).items())
+    repositories, conflicts = _group_repositories(addons)
+    for name, other_name in conflicts:
+        printing.warning(
+            "Addons {} conflicts with {}: same path but different URL or revision".format(name, other_name)
+        )
+
+    odoo_repository = Repository(
+        names=(ODOO_NAME,),
+        path=odoo.path,
+        url=odoo.url,
+        branch=odoo.version,
+        commit=odoo.commit,
+        partial=odoo.partial,
+        sparse=get_sparse_directories([odoo], odoo=True),
+    )
+    addons_paths = (
+        os.path.join(odoo.path, "odoo/addons"),
+        os.path.join(odoo.path, "addons"),
+    ) + tuple(record.path for record in addons)
+    return Project(
+        file=os.path.abspath(path),
+        odoo=odoo,
+        options=MappingProxyType(options),
+        addons=addons,
+        odoo_repository=odoo_repository,
+        repositories=repositories,
+        conflicts=conflicts,
+        addons_paths=addons_paths,
+    )
+
+
+def _load_raw_config(path, key, write=True):
+    """
+    Load the raw configuration of the given odoons YAML file through the parsed config cache
+
+    The cache is a JSON file stored in the default state directory next to the YAML
+    file and keyed by the YAML file modification time and size. Cache hits do not
+    import the YAML stack at all.
+
+    :param path: odoons YAML file absolute path
+    :param key: [mtime, size] of the YAML file
+    :param write: whether the cache may be written on cache misses
+    :return: raw configuration dict()
+    """
+    cache_path = os.path.join(os.path.dirname(path), DEFAULT_OPTIONS[OPT_STATE_DIR], CONFIG_CACHE_FILE)
+    try:
+        with open(cache_path, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        cache = {}
+    entry = cache.get(path)
+    if entry and entry.get("key") == key:
+        return entry["data"]
+
+    data = load_odoons_config(path)
+    if not write:
+        return data
+    try:
+        cache[path] = {"key": key, "data": data}
+        content = json.dumps(cache)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path + ".tmp", "w") as file:
+            file.write(content)
+        os.replace(cache_path + ".tmp", cache_path)
+    except (OSError, TypeError, ValueError):
+        # Values which are not JSON serializable or read-only file system: no caching
+        pass
+    return data
+
+
+def load_project(path, write=True, base_dir=None):
+    """
+    Load the project model of the given odoons YAML file
+
+    The model is cached per process and only rebuilt when the file changes. The raw
+    configuration is also cached on disk across processes.
+
+    :param path: odoons YAML file path
+    :param write: whether the on disk cache may be written (e.g. not on dry runs)
+    :param base_dir: directory relative paths are resolved from, current directory by default
+    :return: Project
+    """
+    abspath = os.path.abspath(path)
+    base_dir = os.path.abspath(base_dir or os.getcwd())
+    stat = os.stat(abspath)
+    key = [stat.st_mtime_ns, stat.st_size]
+    with _projects_lock:
+        cached = _projects.get((abspath, base_dir))
+        if cached and cached[0] == key:
+            return cached[1]
+        project = parse_project(abspath, _load_raw_config(abspath, key, write), base_dir)
+        _projects[(abspath, base_dir)] = (key, project)
+        return project
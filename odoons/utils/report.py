@@ -0,0 +1,168 @@
+"""
+Run report
+
+When enabled (`--report` option), every phase and every subprocess (git, pip) is
+recorded with its wall time, exit code, repository and, when git reports it, the
+number of bytes transferred. Bytes are only counted for captured git output
+(concurrent processing): streamed output is left untouched for the terminal. Events
+are written as JSON (or JSON lines when the report file name ends with `.jsonl`) so
+CI can chart trends.
+"""
+import json
+import re
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+EVENT_STEP = "step"
+EVENT_COMMAND = "command"
+
+GIT_PHASES = {
+    "reset": "checkout",
+    "checkout": "checkout",
+    "sparse-checkout": "checkout",
+    "clean": "checkout",
+}
+# Global git options whose value is given as the next argument
+GIT_OPTIONS_WITH_VALUE = ("-C", "-c", "--git-dir", "--work-tree", "--namespace", "--config-env")
+SIZE_UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+RECEIVED_PATTERN = re.compile(r"Receiving objects: .*?, ([\d.]+) (bytes|KiB|MiB|GiB)")
+
+_lock = threading.Lock()
+_local = threading.local()
+_events = []
+_enabled = False
+_started_at = None
+
+
+def enable():
+    global _enabled, _started_at
+    _enabled = True
+    _started_at = time.time()
+
+
+def is_enabled():
+    return _enabled
+
+
+def _record(event):
+    if not _enabled:
+        return
+    event.setdefault("repo", getattr(_local, "repo", None))
+    with _lock:
+        _events.append(event)
+
+
+def get_git_phase(command):
+    """
+    >>> get_git_phase(["git", "--git-dir", "mirror.git", "-c", "core.quotePath=false", "fetch", "origin"])
+    'fetch'
+    >>> get_git_phase(["git", "-C", "vendor/web", "reset", "--hard"])
+    'checkout'
+
+    :param command: git command as list of arguments
+    :return: phase name of the git command (clone, fetch, checkout, ...)
+    """
+    arguments = command[1:]
+    while arguments and arguments[0].startswith("-"):
+        # Skip global options and their value (git -C <path>, git -c <name>=<value>)
+        arguments = arguments[2:] if arguments[0] in GIT_OPTIONS_WITH_VALUE else arguments[1:]
+    subcommand = arguments[0] if arguments else "git"
+    return GIT_PHASES.get(subcommand, subcommand)
+
+
+def parse_received_bytes(output):
+    """
+    :param output: git command output
+    :return: number of bytes received as reported by git progress or None
+    """
+    matches = RECEIVED_PATTERN.findall(output or "")
+    if not matches:
+        return None
+    value, unit = matches[-1]
+    return int(float(value) * SIZE_UNITS[unit])
+
+
+def record_command(phase, command, returncode, start, received_bytes=None):
+    _record(
+        {
+            "event": EVENT_COMMAND,
+            "phase": phase,
+            "command": " ".join(command),
+            "exit_code": returncode,
+            "start": start,
+            "duration": time.time() - start,
+            "bytes": received_bytes,
+        }
+    )
+
+
+def run(command, phase, **kwargs):
+    """
+    `subprocess.run` wrapper recording the command in the report
+
+    :param command: command as list of arguments
+    :param phase: phase name (pip, ...)
+    :return: subprocess.CompletedProcess
+    """
+    start = time.time()
+    try:
+        process = subprocess.run(command, **kwargs)
+    except subprocess.CalledProcessError as e:
+        record_command(phase, command, e.returncode, start)
+        raise
+    record_command(phase, command, process.returncode, start)
+    return process
+
+
+@contextmanager
+def step(phase, repo=None):
+    """
+    Record the wall time of a phase
+
+    Commands run inside a step for a repository are recorded with this repository.
+
+    :param phase: phase name (pull, config, wrapper, ...)
+    :param repo: optional repository name
+    """
+    previous_repo = getattr(_local, "repo", None)
+    if repo:
+        _local.repo = repo
+    start = time.time()
+    exit_code = 0
+    try:
+        yield
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        _record(
+            {
+                "event": EVENT_STEP,
+                "phase": phase,
+                "repo": repo or previous_repo,
+                "exit_code": exit_code,
+                "start": start,
+                "duration": time.time() - start,
+            }
+        )
+        _local.repo = previous_repo
+
+
+def write(path):
+    """
+    Write recorded events to the given file
+
+    :param path: report file path, JSON lines format if it ends with `.jsonl`
+    :return: None
+    """
+    with _lock:
+        events = sorted(_events, key=lambda event: event["start"])
+    with open(path, "w") as file:
+        if path.endswith(".jsonl"):
+            for event in events:
+                file.write(json.dumps(event) + "\n")
+            return
+        started_at = _started_at or time.time()
+        json.dump({"started_at": started_at, "duration": time.time() - started_at, "events": events}, file, indent=2)
@@ -0,0 +1,317 @@
+"""
+Python requirements files helpers
+
+Requirements files of every repository can be merged into a single deduplicated
+set so pip resolves the whole project at once.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    try:
+        import importlib_metadata as metadata
+    except ImportError:
+        metadata = None
+
+REQUIREMENTS_FILE = "requirements.txt"
+
+REQUIREMENT_PATTERN = re.compile(
+    r"^(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*"
+    r"(?:\[(?P<extras>[^\]]*)\])?\s*"
+    r"(?P<specs>[^;]*?)\s*"
+    r"(?:;\s*(?P<marker>.*))?$"
+)
+PIN_OPERATORS = ("===", "==")
+# PEP 508 direct reference: name[extras] @ url
+DIRECT_REFERENCE_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*\s*(?:\[[^\]]*\])?\s*@")
+LOCAL_PATH_PREFIXES = (".", "/", "~", "file:")
+OPTION_PATTERN = re.compile(r"^(?P<option>--[A-Za-z-]+|-[A-Za-z])(?P<separator>=|\s*)(?P<value>.*)$")
+# pip resolves these paths against the requirements file directory, other local paths against the working directory
+FILE_RELATIVE_OPTIONS = ("-c", "--constraint")
+FIND_LINKS_OPTIONS = ("-f", "--find-links")
+EDITABLE_OPTIONS = ("-e", "--editable")
+
+
+def canonical_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def get_requirements_file(path):
+    """
+    :param path: repository directory
+    :return: requirements file path or None if the directory has no requirements file
+    """
+    req_file_path = os.path.join(path, REQUIREMENTS_FILE)
+    if os.path.exists(req_file_path) and os.path.isfile(req_file_path):
+        return req_file_path
+    return None
+
+
+def _read_requirements(path):
+    """
+    :param path: requirements file path
+    :return: list of (line, path of the file the line comes from) tuples
+    """
+    lines = []
+    with open(path, "r") as file:
+        for line in file:
+            line = re.sub(r"(^|\s)#.*$", "", line).strip()
+            if not line:
+                continue
+            for prefix in ("-r ", "--requirement "):
+                if line.startswith(prefix):
+                    included = os.path.join(os.path.dirname(path), line[len(prefix) :].strip())
+                    lines += _read_requirements(included)
+                    break
+            else:
+                lines.append((line, path))
+    return lines
+
+
+def read_requirements(path):
+    """
+    Read requirements lines of the given file following `-r` includes
+
+    :param path: requirements file path
+    :return: list of stripped lines without comments
+    """
+    return [line for line, _ in _read_requirements(path)]
+
+
+def _absolute_path(value, directory):
+    """
+    :return: absolute path, value itself for URLs or None for relative `file:` URLs
+    """
+    if value.startswith("file:"):
+        return value if value.startswith("file://") else None
+    if "://" in value:
+        return value
+    return os.path.abspath(os.path.join(directory, os.path.expanduser(value)))
+
+
+def absolute_requirement(line, path):
+    """
+    Rewrite the relative paths of the given requirement line so it can be read from any file
+
+    Constraints files are relative to the requirements file, find links too when they
+    exist there. Editables and local paths are relative to the working directory.
+
+    >>> absolute_requirement("-c constraints.txt", "/src/web/requirements.txt")
+    '-c /src/web/constraints.txt'
+    >>> absolute_requirement("-e ./vendor/foo", "/src/web/requirements.txt") == "-e " + os.path.abspath("vendor/foo")
+    True
+    >>> absolute_requirement("requests>=2", "/src/web/requirements.txt")
+    'requests>=2'
+    >>> absolute_requirement("file:vendor/foo", "/src/web/requirements.txt") is None
+    True
+
+    :param line: requirement line
+    :param path: path of the requirements file the line comes from
+    :return: rewritten line or None when it cannot be rewritten
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    match = OPTION_PATTERN.match(line)
+    if not match:
+        if not line.startswith(LOCAL_PATH_PREFIXES):
+            return line
+        return _absolute_path(line, os.getcwd())
+    option, value = match.group("option"), match.group("value")
+    if option in FILE_RELATIVE_OPTIONS:
+        value = _absolute_path(value, directory)
+    elif option in FIND_LINKS_OPTIONS:
+        if "://" not in value and os.path.exists(os.path.join(directory, value)):
+            value = os.path.join(directory, value)
+    elif option in EDITABLE_OPTIONS and value.startswith(LOCAL_PATH_PREFIXES):
+        value = _absolute_path(value, os.getcwd())
+    else:
+        return line
+    if value is None:
+        return None
+    return option + (match.group("separator") or " ") + value
+
+
+def is_raw_requirement(line):
+    """
+    Check whether the given requirement line must be kept as is instead of being merged
+
+    Options, editables, URLs (VCS or archives), PEP 508 direct references and local
+    paths do not name a project followed by version specifiers.
+
+    >>> is_raw_requirement("git+https://github.com/a/foo.git@main#egg=foo")
+    True
+    >>> is_raw_requirement("foo @ https://example.com/foo-1.0.tar.gz")
+    True
+    >>> is_raw_requirement("./vendor/foo")
+    True
+    >>> is_raw_requirement("foo[bar]>=1.0; python_version < '3.8'")
+    False
+
+    :param line: requirement line
+    :return: bool
+    """
+    return (
+        line.startswith("-")
+        or line.startswith(LOCAL_PATH_PREFIXES)
+        or "://" in line
+        or bool(DIRECT_REFERENCE_PATTERN.match(line))
+    )
+
+
+def get_requirements_hash(lines):
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def is_satisfied(lines):
+    """
+    Check in-process whether installed distributions satisfy the given requirements
+
+    Requirements which cannot be checked (options, URLs, editables) are considered
+    unmet. Without `importlib.metadata` or `packaging`, nothing can be checked.
+
+    :param lines: requirements lines
+    :return: bool
+    """
+    try:
+        from packaging.requirements import Requirement, InvalidRequirement
+    except ImportError:
+        try:
+            from pip._vendor.packaging.requirements import Requirement, InvalidRequirement
+        except ImportError:
+            return False
+    if metadata is None:
+        return False
+    for line in lines:
+        if line.startswith("-"):
+            return False
+        try:
+            requirement = Requirement(line)
+        except InvalidRequirement:
+            return False
+        if requirement.url:
+            return False
+        if requirement.marker and not requirement.marker.evaluate():
+            continue
+        try:
+            version = metadata.version(requirement.name)
+        except metadata.PackageNotFoundError:
+            return False
+        if not requirement.specifier.contains(version, prereleases=True):
+            return False
+    return True
+
+
+def is_editable_install(name, path):
+    """
+    Check whether the given distribution is installed in editable mode from the given path
+
+    Both PEP 660 (`direct_url.json`) and legacy `.egg-link` installs are detected.
+
+    :param name: distribution name
+    :param path: expected project directory
+    :return: bool
+    """
+    path = os.path.realpath(path)
+    if metadata is not None:
+        try:
+            direct_url = metadata.distribution(name).read_text("direct_url.json")
+        except metadata.PackageNotFoundError:
+            direct_url = None
+        if direct_url:
+            data = json.loads(direct_url)
+            url = data.get("url", "")
+            if data.get("dir_info", {}).get("editable") and url.startswith("file://"):
+                return os.path.realpath(url[len("file://") :]) == path
+    for site_dir in sys.path:
+        egg_link = os.path.join(site_dir, name + ".egg-link")
+        if os.path.isfile(egg_link):
+            with open(egg_link, "r") as file:
+                return os.path.realpath(file.readline().strip()) == path
+    return False
+
+
+class MergedRequirements:
+    """
+    Deduplicated requirements collected from several requirements files
+
+    Requirements are grouped by canonical project name and environment marker.
+    Specifiers of a group are combined, distinct version pins are conflicts. Other
+    incompatible specifiers are left to pip resolver. Relative paths are made absolute,
+    files with lines which cannot be rewritten are not merged (see `separate_files`).
+
+    >>> merged = MergedRequirements()
+    >>> merged.add("git+https://github.com/a/foo.git@main#egg=foo", "a")
+    >>> merged.add("git+https://github.com/b/bar.git@main#egg=bar", "b")
+    >>> merged.add("git+https://github.com/a/foo.git@main#egg=foo", "c")
+    >>> merged.add("requests>=2", "a")
+    >>> merged.add("requests<3", "b")
+    >>> merged.lines()
+    ['git+https://github.com/a/foo.git@main#egg=foo', 'git+https://github.com/b/bar.git@main#egg=bar', 'requests>=2,<3']
+    """
+
+    def __init__(self):
+        self._requirements = OrderedDict()
+        self._raw = OrderedDict()
+        self.separate_files = []
+
+    def add_file(self, path, source):
+        """
+        Merge the requirements of the given file, or keep it apart when some of its
+        relative paths cannot be rewritten
+
+        :param path: requirements file path
+        :param source: name reported in conflicts
+        :return: None
+        """
+        lines = [absolute_requirement(line, line_path) for line, line_path in _read_requirements(path)]
+        if None in lines:
+            self.separate_files.append((path, source))
+            return
+        for line in lines:
+            self.add(line, source)
+
+    def add(self, line, source):
+        match = REQUIREMENT_PATTERN.match(line)
+        if is_raw_requirement(line) or not match:
+            # Options, editables, URLs and local paths are kept as is (deduplicated)
+            self._raw.setdefault(line, []).append(source)
+            return
+        marker = (match.group("marker") or "").strip()
+        key = (canonical_name(match.group("name")), marker)
+        requirement = self._requirements.setdefault(
+            key, {"name": match.group("name"), "extras": set(), "specs": OrderedDict()}
+        )
+        if match.group("extras"):
+            requirement["extras"].update(e.strip() for e in match.group("extras").split(",") if e.strip())
+        for spec in match.group("specs").split(","):
+            spec = spec.replace(" ", "")
+            if spec:
+                requirement["specs"].setdefault(spec, []).append(source)
+
+    def conflicts(self):
+        """
+        :return: list of (name, marker, {pin: [sources]}) tuples for requirements pinned to several versions
+        """
+        conflicts = []
+        for (name, marker), requirement in self._requirements.items():
+            pins = {spec: sources for spec, sources in requirement["specs"].items() if spec.startswith(PIN_OPERATORS)}
+            if len(pins) > 1:
+                conflicts.append((requirement["name"], marker, pins))
+        return conflicts
+
+    def lines(self):
+        lines = list(self._raw.keys())
+        for (name, marker), requirement in self._requirements.items():
+            line = requirement["name"]
+            if requirement["extras"]:
+                line += "[{}]".format(",".join(sorted(requirement["extras"])))
+            line += ",".join(requirement["specs"].keys())
+            if marker:
+                line += "; " + marker
+            lines.append(line)
+        return lines
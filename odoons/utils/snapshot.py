@@ -0,0 +1,197 @@
+"""
+Content-addressed vendor snapshots
+
+A snapshot is a compressed archive of the Odoo checkout and of every git addons
+repository at their resolved commits (frozen commit or lock file commit). Its name
+holds a hash of the resolved commits so a snapshot matching the current
+configuration can be restored without any git or network access.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import uuid
+
+from . import gitstate, printing
+from .git import get_head
+from .lock import ODOO_LOCK_KEY, get_lock_path, load_lock
+
+SNAPSHOT_PREFIX = "odoons-snapshot-"
+SNAPSHOT_SUFFIX = ".tar.gz"
+SNAPSHOT_MANIFEST = "odoons-snapshot.json"
+SNAPSHOT_REPOSITORIES = "repositories"
+SNAPSHOT_KEY_LENGTH = 20
+COMPRESS_LEVEL = 6
+EXCLUDED_NAMES = ("__pycache__",)
+
+
+def _locked_commit(repository, locked):
+    if repository.commit:
+        return repository.commit
+    if locked.get("url") == repository.url and locked.get("branch") == repository.branch:
+        return locked.get("commit")
+    return None
+
+
+def get_snapshot_entries(project):
+    """
+    Resolve the commit of Odoo and of every git addons repository
+
+    :param project: Project
+    :return: list of entry dict() (path relative to the project, url, commit, sparse)
+    """
+    lock = load_lock(get_lock_path(project.file)) or {ODOO_LOCK_KEY: {}, "addons": {}}
+    project_dir = os.path.dirname(project.file)
+    repositories = [(project.odoo_repository, lock[ODOO_LOCK_KEY])]
+    for repository in project.repositories:
+        repositories.append((repository, lock["addons"].get(repository.names[0]) or {}))
+
+    entries = []
+    for repository, locked in repositories:
+        commit = _locked_commit(repository, locked)
+        if not commit:
+            raise RuntimeError(
+                "Unresolved commit for {}: run odoons init to update the lock file".format(", ".join(repository.names))
+            )
+        entries.append(
+            {
+                "names": list(repository.names),
+                "path": os.path.relpath(repository.path, project_dir),
+                "url": repository.url,
+                "commit": commit,
+                "sparse": list(repository.sparse or []),
+            }
+        )
+    return entries
+
+
+def get_snapshot_key(entries, include_git=True):
+    """
+    :param entries: snapshot entries as returned by `get_snapshot_entries`
+    :param include_git: whether git directories are part of the snapshot
+    :return: hash of the resolved commits
+    """
+    content = json.dumps([entries, include_git], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:SNAPSHOT_KEY_LENGTH]
+
+
+def _is_at_commit(project_dir, entry):
+    head = get_head(os.path.join(project_dir, entry["path"]))
+    return bool(head) and head.startswith(entry["commit"])
+
+
+def get_snapshot_path(directory, key):
+    return os.path.join(directory, SNAPSHOT_PREFIX + key + SNAPSHOT_SUFFIX)
+
+
+def export_snapshot(project, directory, include_git=True):
+    """
+    Pack the resolved Odoo and addons checkouts into a snapshot archive
+
+    Checkouts must be at their resolved commits. An existing snapshot with the same
+    key is kept as is.
+
+    :param project: Project
+    :param directory: snapshots directory
+    :param include_git: whether git directories are packed (restored tree can be updated by odoons)
+    :return: snapshot archive path
+    """
+    entries = get_snapshot_entries(project)
+    key = get_snapshot_key(entries, include_git)
+    path = get_snapshot_path(directory, key)
+    if os.path.isfile(path):
+        printing.info("Snapshot {} already exists".format(path))
+        return path
+
+    project_dir = os.path.dirname(project.file)
+    for entry in entries:
+        if not _is_at_commit(project_dir, entry):
+            raise RuntimeError(
+                "{} is not at its resolved commit {}: run odoons init first".format(entry["path"], entry["commit"])
+            )
+
+    def exclude(tarinfo):
+        name = os.path.basename(tarinfo.name)
+        if name in EXCLUDED_NAMES or (not include_git and name == ".git"):
+            return None
+        return tarinfo
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, uuid.uuid4().hex[:8])
+    manifest = json.dumps({"key": key, "git": include_git, "entries": entries}, indent=2).encode()
+    try:
+        with tarfile.open(tmp_path, "w:gz", compresslevel=COMPRESS_LEVEL) as archive:
+            info = tarfile.TarInfo(SNAPSHOT_MANIFEST)
+            info.size = len(manifest)
+            archive.addfile(info, io.BytesIO(manifest))
+            for index, entry in enumerate(entries):
+                printing.info("Packing {}...".format(entry["path"]))
+                archive.add(
+                    os.path.join(project_dir, entry["path"]),
+                    arcname="{}/{}".format(SNAPSHOT_REPOSITORIES, index),
+                    filter=exclude,
+                )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return path
+
+
+def _extract(archive, directory):
+    for member in archive.getmembers():
+        name = os.path.normpath(member.name)
+        if os.path.isabs(name) or name.startswith(".."):
+            raise RuntimeError("Invalid snapshot member {}".format(member.name))
+    if hasattr(tarfile, "tar_filter"):
+        archive.extractall(directory, filter="tar")
+    else:
+        archive.extractall(directory)
+
+
+def import_snapshot(project, directory, include_git=True, state_dir=None):
+    """
+    Restore the Odoo and addons checkouts from the snapshot matching the configuration
+
+    Every checkout is extracted in a temporary directory and then moved in place,
+    replacing the existing directory.
+
+    :param project: Project
+    :param directory: snapshots directory
+    :param include_git: whether to look for a snapshot including git directories
+    :param state_dir: directory used for extraction (same file system as checkouts)
+    :return: restored snapshot archive path or None if checkouts are already up to date
+    """
+    entries = get_snapshot_entries(project)
+    key = get_snapshot_key(entries, include_git)
+    path = get_snapshot_path(directory, key)
+    project_dir = os.path.dirname(project.file)
+    if include_git and all(_is_at_commit(project_dir, entry) for entry in entries):
+        printing.info("Checkouts already match snapshot {}".format(key))
+        return None
+    if not os.path.isfile(path):
+        raise RuntimeError("No snapshot {} in {}".format(key, directory))
+
+    state_dir = state_dir or project_dir
+    os.makedirs(state_dir, exist_ok=True)
+    extract_dir = tempfile.mkdtemp(prefix="snapshot-", dir=state_dir)
+    try:
+        printing.info("Extracting {}...".format(path))
+        with tarfile.open(path, "r:gz") as archive:
+            _extract(archive, extract_dir)
+        for index, entry in enumerate(entries):
+            target = os.path.join(project_dir, entry["path"])
+            printing.info("Restoring {}...".format(entry["path"]))
+            if os.path.islink(target):
+                os.unlink(target)
+            elif os.path.lexists(target):
+                shutil.rmtree(target)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(extract_dir, SNAPSHOT_REPOSITORIES, str(index)), target)
+            gitstate.invalidate(target)
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+    return path
@@ -0,0 +1,168 @@
+"""
+SSH connection multiplexing
+
+When enabled, a single SSH ControlMaster connection is opened per remote host alias,
+user and port, the first time a repository of this host is accessed, and git reuses it
+for every clone, fetch and ls-remote through `GIT_SSH_COMMAND`. The SSH handshake then
+happens once per host instead of once per git call. Master connections are closed at
+exit.
+
+Connections are keyed on the host alias as written in the URL rather than on the
+resolved host name: aliases of a same host may use distinct identities in the SSH
+configuration.
+"""
+import atexit
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from urllib.parse import urlsplit
+
+from . import printing, report
+
+SSH_SCHEMES = ("ssh", "git+ssh", "ssh+git")
+# Master connections close by themselves after this idle time (seconds) if odoons is killed
+CONTROL_PERSIST = 300
+# scp-like syntax: [user@]host:path, the colon comes before any slash
+SCP_LIKE_URL = re.compile(r"^(?:(?P<user>[^@/:]+)@)?(?P<host>[^/:]+):(?!//)")
+
+_lock = threading.Lock()
+_host_locks = {}
+_masters = {}
+_control_dir = None
+_previous_command = None
+_ssh_command = None
+
+
+def get_ssh_host(url):
+    """
+    :param url: git repository URL
+    :return: tuple (SSH destination, port or None) or None for non SSH URLs
+    """
+    if "://" in url:
+        parts = urlsplit(url)
+        if parts.scheme not in SSH_SCHEMES or not parts.hostname:
+            return None
+        destination = "{}@{}".format(parts.username, parts.hostname) if parts.username else parts.hostname
+        return destination, parts.port
+    match = SCP_LIKE_URL.match(url)
+    if not match:
+        return None
+    user, host = match.group("user"), match.group("host")
+    return ("{}@{}".format(user, host) if user else host), None
+
+
+def is_enabled():
+    return _control_dir is not None
+
+
+def _control_options():
+    return ["-o", "ControlPath={}".format(os.path.join(_control_dir, "%r@%n:%p"))]
+
+
+def _get_ssh_command():
+    """
+    :return: ssh command git would run: `GIT_SSH_COMMAND`, `core.sshCommand` or ssh
+    """
+    command = os.environ.get("GIT_SSH_COMMAND")
+    if command:
+        return command
+    process = subprocess.run(
+        ["git", "config", "--get", "core.sshCommand"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return process.stdout.decode(errors="replace").strip() or None
+
+
+def enable():
+    """
+    Route git SSH connections through the multiplexed master connections
+
+    The multiplexing options are appended to the ssh command git would run otherwise
+    (`GIT_SSH_COMMAND` or `core.sshCommand`, which `GIT_SSH_COMMAND` overrides).
+    Nothing is done when `GIT_SSH` points to a custom program.
+
+    :return: None
+    """
+    global _control_dir, _previous_command, _ssh_command
+    with _lock:
+        if _control_dir is not None:
+            return
+        if os.environ.get("GIT_SSH"):
+            printing.debug("GIT_SSH is set, SSH multiplexing disabled")
+            return
+        _control_dir = tempfile.mkdtemp(prefix="odoons-ssh-")
+        _previous_command = os.environ.get("GIT_SSH_COMMAND")
+        _ssh_command = _get_ssh_command() or "ssh"
+        # Connections only use an existing master: masters are started by `connect` only
+        options = ["-o", "ControlMaster=no"] + _control_options()
+        os.environ["GIT_SSH_COMMAND"] = " ".join([_ssh_command] + [shlex.quote(o) for o in options])
+    atexit.register(close)
+
+
+def connect(url):
+    """
+    Start the master connection of the host of the given repository URL if needed
+
+    Concurrent callers for the same host wait for the first one to connect. A failing
+    master connection is not retried: git then connects directly.
+
+    :param url: git repository URL
+    :return: None
+    """
+    host = get_ssh_host(url) if is_enabled() else None
+    if not host:
+        return
+    with _lock:
+        host_lock = _host_locks.setdefault(host, threading.Lock())
+    with host_lock:
+        if host in _masters:
+            return
+        destination, port = host
+        command = shlex.split(_ssh_command)
+        command += ["-o", "ControlMaster=yes", "-o", "ControlPersist={}".format(CONTROL_PERSIST)]
+        command += _control_options() + ["-f", "-N"]
+        if port:
+            command += ["-p", str(port)]
+        printing.info("Opening SSH connection to {}...".format(destination))
+        # The backgrounded master inherits stderr: a pipe would never be closed
+        with tempfile.TemporaryFile(mode="w+") as stderr:
+            process = report.run(
+                command + [destination], "ssh", stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=stderr
+            )
+            stderr.seek(0)
+            error = stderr.read().strip()
+        _masters[host] = process.returncode == 0
+        if process.returncode != 0:
+            printing.warning("SSH multiplexing unavailable for {}: {}".format(destination, error))
+
+
+def close():
+    """
+    Close every master connection and restore `GIT_SSH_COMMAND`
+
+    :return: None
+    """
+    global _control_dir, _previous_command, _ssh_command
+    with _lock:
+        if _control_dir is None:
+            return
+        for (destination, port), connected in _masters.items():
+            if not connected:
+                continue
+            command = shlex.split(_ssh_command) + _control_options() + ["-O", "exit"]
+            if port:
+                command += ["-p", str(port)]
+            subprocess.run(command + [destination], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        shutil.rmtree(_control_dir, ignore_errors=True)
+        if _previous_command is None:
+            os.environ.pop("GIT_SSH_COMMAND", None)
+        else:
+            os.environ["GIT_SSH_COMMAND"] = _previous_command
+        _masters.clear()
+        _host_locks.clear()
+        _control_dir = None
+        _previous_command = None
+        _ssh_command = None
@@ -0,0 +1,38 @@
+"""
+Odoons state files
+
+State files are small JSON documents stored in the state directory recording what
+previous runs did (requirements hashes, ...) so unchanged work can be skipped.
+"""
+import json
+import os
+
+from .config import OPT_STATE_DIR, DEFAULT_OPTIONS
+
+
+def get_state_dir(options):
+    return os.path.abspath(options.get(OPT_STATE_DIR, DEFAULT_OPTIONS[OPT_STATE_DIR]))
+
+
+def load_state(options, name):
+    """
+    :param options: odoons options dict()
+    :param name: state file name without extension
+    :return: state dict() or an empty dict() if the state file does not exist or is invalid
+    """
+    path = os.path.join(get_state_dir(options), name + ".json")
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def dump_state(options, name, data):
+    state_dir = get_state_dir(options)
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, name + ".json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
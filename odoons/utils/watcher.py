@@ -0,0 +1,186 @@
+"""
+File system watchers
+
+Watchers report which of the watched files and directories changed since they were
+first watched, including while the changes are being applied:
+
+- inotify based (optional `inotify_simple` dependency, Linux only): parent directories
+  of watched files are watched so files replaced by editors (write and rename) are
+  still reported
+- polling based fallback comparing file stats and directory listings
+"""
+import os
+import time
+
+from . import printing
+
+DEFAULT_INTERVAL = 1.0
+# Events received within this delay are reported together (editors write files in several steps)
+DEBOUNCE_DELAY = 0.2
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _directory_key(path):
+    try:
+        return tuple(sorted(os.listdir(path)))
+    except OSError:
+        return None
+
+
+class PollingWatcher:
+    """
+    Watcher comparing file stats and directory listings every `interval` seconds
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self._interval = interval
+        self._files = {}
+        self._directories = {}
+
+    def watch(self, files, directories):
+        """
+        Replace the watched paths
+
+        Paths which were already watched keep their last reported state so changes
+        made since then are still reported by the next `wait`.
+
+        :param files: file paths, changes of their stats are reported
+        :param directories: directory paths, entries added or removed are reported
+        :return: None
+        """
+        self._files = {path: self._files[path] if path in self._files else _file_key(path) for path in files}
+        self._directories = {
+            path: self._directories[path] if path in self._directories else _directory_key(path)
+            for path in directories
+        }
+
+    def _changes(self):
+        changed = set()
+        for path, key in self._files.items():
+            new_key = _file_key(path)
+            if new_key != key:
+                self._files[path] = new_key
+                changed.add(path)
+        for path, key in self._directories.items():
+            new_key = _directory_key(path)
+            if new_key != key:
+                self._directories[path] = new_key
+                changed.add(path)
+        return changed
+
+    def wait(self):
+        """
+        Block until at least one watched path changes
+
+        :return: set of changed paths
+        """
+        while True:
+            time.sleep(self._interval)
+            changed = self._changes()
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Watcher based on Linux inotify events
+    """
+
+    def __init__(self, inotify_simple):
+        self._flags = inotify_simple.flags
+        self._inotify = inotify_simple.INotify()
+        self._descriptors = {}
+
+    def _mask(self):
+        return self._entry_mask() | self._flags.CLOSE_WRITE | self._flags.ATTRIB
+
+    def _entry_mask(self):
+        flags = self._flags
+        return flags.CREATE | flags.DELETE | flags.MOVED_TO | flags.MOVED_FROM
+
+    def watch(self, files, directories):
+        """
+        Replace the watched paths
+
+        Directories which were already watched keep their watch descriptor so events
+        queued since then are still reported by the next `wait`.
+
+        :param files: file paths, changes of their content are reported
+        :param directories: directory paths, entries added or removed are reported
+        :return: None
+        """
+        watched = {}
+        for path in files:
+            watched.setdefault(os.path.dirname(path), (set(), False))[0].add(os.path.basename(path))
+        for path in directories:
+            watched[path] = (watched.get(path, (set(), False))[0], True)
+
+        descriptors = {}
+        for path, (names, whole) in watched.items():
+            try:
+                # Watching an already watched directory returns its existing descriptor
+                descriptor = self._inotify.add_watch(path, self._mask())
+            except OSError:
+                printing.debug("Cannot watch missing directory {}".format(path))
+                continue
+            descriptors[descriptor] = (path, names, whole)
+        for descriptor in set(self._descriptors) - set(descriptors):
+            try:
+                self._inotify.rm_watch(descriptor)
+            except OSError:
+                # Watch already removed along with its directory
+                pass
+        self._descriptors = descriptors
+
+    def wait(self):
+        """
+        Block until at least one watched path changes
+
+        :return: set of changed paths
+        """
+        while True:
+            changed = set()
+            for event in self._inotify.read(read_delay=int(DEBOUNCE_DELAY * 1000)):
+                if event.wd not in self._descriptors:
+                    continue
+                path, names, whole = self._descriptors[event.wd]
+                if event.name in names:
+                    changed.add(os.path.join(path, event.name))
+                if whole and event.mask & self._entry_mask():
+                    changed.add(path)
+            if changed:
+                return changed
+
+    def close(self):
+        self._inotify.close()
+
+
+def get_watcher(polling=False, interval=DEFAULT_INTERVAL):
+    """
+    Build an inotify watcher, falling back to polling
+
+    :param polling: force the polling watcher
+    :param interval: polling interval in seconds
+    :return: InotifyWatcher or PollingWatcher
+    """
+    if not polling:
+        try:
+            import inotify_simple
+        except ImportError:
+            printing.debug("inotify_simple is not installed, polling for changes")
+        else:
+            try:
+                return InotifyWatcher(inotify_simple)
+            except OSError as e:
+                printing.warning("inotify unavailable ({}), polling for changes".format(e))
+    return PollingWatcher(interval)
@@ -0,0 +1,188 @@
+"""
+Multi-project workspace
+
+Repositories required by several odoons projects are resolved together: every URL
+is fetched once into a bare mirror, then each distinct (URL, commit) pair is checked
+out once as a git worktree of its mirror. Projects use these shared checkouts
+through symbolic links, so a repository pinned by dozens of projects only costs one
+fetch and one working tree.
+"""
+import os
+import re
+import shutil
+from collections import OrderedDict, namedtuple
+
+from . import gitstate, printing
+from .git import get_head, git_output, run_command
+from .lock import ODOO_LOCK_KEY, get_lock_path, load_lock, dump_lock, lock_entry
+from .mirror import Mirror
+from .project import load_project
+
+WORKSPACE_MIRRORS = "mirrors"
+WORKSPACE_CHECKOUTS = "checkouts"
+SHARED_COMMIT_LENGTH = 12
+
+# Repository used by a project: addons_names is None for Odoo
+WorkspaceReference = namedtuple("WorkspaceReference", ["project", "repository", "addons_names"])
+
+
+def load_projects(files):
+    """
+    :param files: odoons YAML files
+    :return: list of Project, paths resolved from the directory of each file
+    """
+    projects = []
+    for path in files:
+        path = os.path.abspath(path)
+        projects.append(load_project(path, base_dir=os.path.dirname(path)))
+    return projects
+
+
+def collect_references(projects):
+    """
+    Collect every shareable repository of the given projects
+
+    Sparse and partial repositories have project specific working trees and are left
+    to `odoons pull`.
+
+    :param projects: list of Project
+    :return: OrderedDict() URL -> list of WorkspaceReference
+    """
+    references = OrderedDict()
+    for project in projects:
+        repositories = [(project.odoo_repository, None)]
+        repositories += [(repository, repository.names) for repository in project.repositories]
+        for repository, addons_names in repositories:
+            if repository.sparse or repository.partial:
+                printing.warning(
+                    "{}: {} is sparse or partial and is not shared".format(project.file, ", ".join(repository.names))
+                )
+                continue
+            references.setdefault(repository.url, []).append(WorkspaceReference(project, repository, addons_names))
+    return references
+
+
+class SharedCheckouts:
+    def __init__(self, directory):
+        self._directory = os.path.abspath(os.path.expanduser(directory))
+        self._mirrors_dir = os.path.join(self._directory, WORKSPACE_MIRRORS)
+        self._checkouts_dir = os.path.join(self._directory, WORKSPACE_CHECKOUTS)
+
+    def mirror(self, url):
+        return Mirror(self._mirrors_dir, url)
+
+    def sync(self, url):
+        """
+        Fetch the mirror of the given URL
+
+        :return: git return code
+        """
+        return self.mirror(url).sync(run_command)
+
+    def resolve(self, url, repository):
+        """
+        Resolve the commit of a repository from its synced mirror
+
+        :param url: repository URL
+        :param repository: Repository record
+        :return: full commit SHA or None
+        """
+        revision = repository.commit or "refs/heads/" + repository.branch
+        return git_output(["git", "--git-dir", self.mirror(url).path, "rev-parse", "--verify", revision + "^{commit}"])
+
+    def checkout_path(self, url, commit):
+        name = re.sub(r"\.git$", "", os.path.basename(self.mirror(url).path))
+        return os.path.join(self._checkouts_dir, "{}-{}".format(name, commit[:SHARED_COMMIT_LENGTH]))
+
+    def checkout(self, url, commits):
+        """
+        Create the missing shared checkouts of the given commits as worktrees of the mirror
+
+        :param url: repository URL
+        :param commits: commit SHAs
+        :return: list of commits whose checkout failed
+        """
+        mirror = self.mirror(url)
+        run_command(["git", "--git-dir", mirror.path, "worktree", "prune"])
+        failures = []
+        for commit in commits:
+            path = self.checkout_path(url, commit)
+            if get_head(path) == commit:
+                continue
+            printing.info("Checking out {} at {}...".format(url, commit))
+            os.makedirs(self._checkouts_dir, exist_ok=True)
+            if run_command(["git", "--git-dir", mirror.path, "worktree", "add", "--detach", path, commit]) != 0:
+                failures.append(commit)
+        return failures
+
+
+def is_replaceable_checkout(path, commit):
+    """
+    :param path: project repository path
+    :param commit: shared checkout commit SHA
+    :return: whether the path is a checkout at the given commit without local changes nor untracked files
+    """
+    return get_head(path) == commit and git_output(["git", "-C", path, "status", "--porcelain"]) == ""
+
+
+def link_checkout(path, target, commit, replace=False):
+    """
+    Point the given project repository path to a shared checkout
+
+    Symbolic links are replaced atomically. Real directories are only replaced when
+    requested and when they are clean checkouts of the same commit: their local
+    branches and stashes are lost.
+
+    :param path: project repository path
+    :param target: shared checkout path
+    :param commit: shared checkout commit SHA
+    :param replace: whether clean checkouts of the same commit are replaced
+    :return: whether the path now points to the shared checkout
+    """
+    replaced_path = None
+    if os.path.islink(path):
+        if os.readlink(path) == target:
+            return True
+    elif os.path.lexists(path):
+        if not replace:
+            printing.warning(
+                "{} already exists and is not a shared checkout, skipping: "
+                "run `odoons reset` in its project or use --replace".format(path)
+            )
+            return False
+        if not is_replaceable_checkout(path, commit):
+            printing.warning("{} is not a clean checkout of {}, skipping".format(path, commit))
+            return False
+        printing.info("Replacing {} by its shared checkout...".format(path))
+        replaced_path = path + ".odoons-replaced"
+        os.rename(path, replaced_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".odoons-tmp"
+    if os.path.lexists(tmp_path):
+        os.unlink(tmp_path)
+    os.symlink(target, tmp_path)
+    os.replace(tmp_path, path)
+    gitstate.invalidate(path)
+    if replaced_path:
+        shutil.rmtree(replaced_path, ignore_errors=True)
+    return True
+
+
+def update_project_lock(project, resolved):
+    """
+    Record the resolved commits of shared repositories in the project lock file
+
+    :param project: Project
+    :param resolved: list of (Repository, addons names or None for Odoo, commit SHA)
+    :return: None
+    """
+    lock_path = get_lock_path(project.file)
+    data = load_lock(lock_path) or {ODOO_LOCK_KEY: {}, "addons": {}}
+    for repository, addons_names, commit in resolved:
+        entry = lock_entry(repository.url, repository.branch, commit)
+        if addons_names is None:
+            data[ODOO_LOCK_KEY] = entry
+            continue
+        for name in addons_names:
+            data["addons"][name] = entry
+    dump_lock(lock_path, data)
@@ -15,5 +15,6 @@ setuptools.setup(
     classifiers=["Programming Language :: Python :: 3"],
     python_requires=">=3.6",
     install_requires=["ruamel.yaml>=0.15.1"],
+    extras_require={"pygit2": ["pygit2"], "inotify": ["inotify_simple"]},
     entry_points={"console_scripts": ["odoons = odoons.core:main"]},
 )